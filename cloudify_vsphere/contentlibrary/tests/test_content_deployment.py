@@ -20,6 +20,7 @@ from pyVmomi import vim
 from cloudify.state import current_ctx
 from cloudify.mocks import MockCloudifyContext
 
+from vsphere_plugin_common import clients
 from vsphere_plugin_common.constants import DELETE_NODE_ACTION
 import cloudify_vsphere.contentlibrary.deployment as deployment
 
@@ -28,6 +29,7 @@ class ContentDeploymentTest(unittest.TestCase):
 
     def setUp(self):
         super(ContentDeploymentTest, self).setUp()
+        clients.reset_sessions()
         self.mock_ctx = MockCloudifyContext(
             'node_name',
             properties={
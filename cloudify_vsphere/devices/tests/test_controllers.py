@@ -22,6 +22,7 @@ from cloudify.mocks import MockCloudifyContext
 from cloudify.manager import DirtyTrackingDict
 from cloudify.exceptions import NonRecoverableError
 
+from vsphere_plugin_common import clients
 from cloudify_vsphere import devices
 
 
@@ -29,6 +30,7 @@ class VsphereControllerTest(unittest.TestCase):
 
     def tearDown(self):
         current_ctx.clear()
+        clients.reset_sessions()
         super(VsphereControllerTest, self).tearDown()
 
     def _gen_ctx(self):
@@ -98,9 +98,9 @@ def create(ctx, server_client, name, use_external_resource, host_name=None,
            cluster_name=None, pool_spec=None):
     is_node_deprecated(ctx.node.type)
     if use_external_resource:
-        vmware_resource = server_client.get_resource_pool_by_name(name)
+        resource_pool_id = server_client.get_resource_pool_id_by_name(name)
 
-        if not vmware_resource:
+        if not resource_pool_id:
             raise NonRecoverableError(
                 'Could not use existing resource_pool "{name}" as no '
                 'resource_pool by that name exists!'.format(
@@ -108,7 +108,7 @@ def create(ctx, server_client, name, use_external_resource, host_name=None,
                 )
             )
 
-        ctx.instance.runtime_properties[RESOURCE_POOL_ID] = vmware_resource.id
+        ctx.instance.runtime_properties[RESOURCE_POOL_ID] = resource_pool_id
     else:
         vmware_resource = None
         spec = _get_pool_spec(pool_spec)
@@ -68,6 +68,27 @@ class ResourcePoolTest(unittest.TestCase):
         self.assertEqual(self.mock_ctx.instance.runtime_properties,
                          {RESOURCE_POOL_ID: 42})
 
+    @patch('vsphere_plugin_common.VsphereClient.get')
+    def test_create_external(self, mock_client_get):
+        self.mock_ctx.node._type = 'cloudify.vsphere.nodes.ResourcePool'
+
+        mock_client_get().get_resource_pool_id_by_name.side_effect = [
+            'resgroup-42']
+        self.mock_ctx.node._properties = {
+            'connection_config': {
+                'host': 'host',
+                'port': '80'
+            },
+            "use_external_resource": True,
+            "name": "test_pool",
+        }
+
+        resource_pool.create()
+        mock_client_get().get_resource_pool_id_by_name.assert_called_with(
+            'test_pool')
+        self.assertEqual(self.mock_ctx.instance.runtime_properties,
+                         {RESOURCE_POOL_ID: 'resgroup-42'})
+
     @patch('vsphere_plugin_common.VsphereClient.get')
     def test_delete(self, mock_client_get):
         mock_client_get().delete_resource_pool.side_effect = [None]
@@ -16,13 +16,12 @@
 from cloudify.exceptions import NonRecoverableError
 
 # This package imports
-import json
-from pyVmomi import VmomiSupport
 from vsphere_plugin_common import with_network_client
 from vsphere_plugin_common.constants import IPPOOL_ID
 from vsphere_plugin_common.utils import (
     op,
     is_node_deprecated,
+    vmomi_to_dict,
     find_instances_by_type_from_rels)
 from vsphere_plugin_common.utils import check_drift as utils_check_drift
 
@@ -61,10 +60,8 @@ def poststart(ctx, network_client, datacenter_name, **_):
         raise NonRecoverableError(
             "There is no ippool id.")
     pool = network_client.query_ippool(datacenter_name, ippool_id)
-    config = json.loads(json.dumps(pool,
-                                   cls=VmomiSupport.VmomiJSONEncoder,
-                                   sort_keys=True, indent=4))
-    ctx.instance.runtime_properties["expected_configuration"] = config
+    ctx.instance.runtime_properties["expected_configuration"] = \
+        vmomi_to_dict(pool)
 
 
 @op
@@ -75,9 +72,7 @@ def check_drift(ctx, network_client, datacenter_name, **_):
         raise NonRecoverableError(
             "There is no ippool id.")
     pool = network_client.query_ippool(datacenter_name, ippool_id)
-    current_configuration = json.loads(json.dumps(pool,
-                                       cls=VmomiSupport.VmomiJSONEncoder,
-                                       sort_keys=True, indent=4))
+    current_configuration = vmomi_to_dict(pool)
     expected_configuration = ctx.instance.runtime_properties[
         "expected_configuration"]
 
@@ -25,6 +25,7 @@ if PY2:
     from urllib import unquote
     from BaseHTTPServer import HTTPServer
     from  SimpleHTTPServer import SimpleHTTPRequestHandler
+    from httplib import HTTPException
 else:
     text_type = str
     from urllib.request import urlopen, Request
@@ -32,8 +33,9 @@ else:
     from urllib.parse import unquote
     from http.server import SimpleHTTPRequestHandler
     from http.server import HTTPServer
+    from http.client import HTTPException
 
 __all__ = [
     'PY2', 'text_type', 'unquote', 'HTTPServer', 'SimpleHTTPRequestHandler',
-    'urlopen', 'URLError', 'Request',
+    'urlopen', 'URLError', 'Request', 'HTTPException',
 ]
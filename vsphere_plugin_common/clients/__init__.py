@@ -35,6 +35,9 @@ import ssl
 import time
 import yaml
 import atexit
+import socket
+import hashlib
+import threading
 from copy import copy
 from collections import namedtuple, MutableMapping
 
@@ -56,12 +59,38 @@ from ..constants import (
 )
 from .._compat import (
     unquote,
-    text_type
+    text_type,
+    HTTPException
 )
 from ..utils import (
     logger,
 )
 
+# Sessions opened by this process, so that operations run one after another
+# on the same worker thread don't each log in to vCenter again. Each thread
+# keeps its own sessions, as a pyVmomi stub must not be shared between
+# threads and the agent may run operations concurrently.
+_sessions = threading.local()
+
+# namedtuple types for cached objects, keyed by name and fields. Creating a
+# type is far more expensive than creating an instance of one, so each type
+# is built once instead of once per entity.
+_cached_object_types = {}
+
+# Properties collected for VMs.
+VM_PROPERTIES = [
+    'name',
+    'summary',
+    'config.changeVersion',
+    'config.hardware.device',
+    'config.hardware.memoryMB',
+    'config.hardware.numCPU',
+    'datastore',
+    'guest.guestState',
+    'guest.net',
+    'network',
+]
+
 
 class Config(object):
 
@@ -188,6 +217,28 @@ class CustomValues(MutableMapping):
         raise ValueError(k)
 
 
+def _get_sessions():
+    if not hasattr(_sessions, 'by_key'):
+        _sessions.by_key = {}
+    return _sessions.by_key
+
+
+def reset_sessions():
+    """
+        Forget the sessions opened by the current thread.
+    """
+    _get_sessions().clear()
+
+
+def _session_key(host, port, username, password, certificate_path,
+                 allow_insecure):
+    # Only a hash of the password is kept in the key.
+    password_hash = hashlib.sha256(
+        text_type(password).encode('utf-8')).hexdigest()
+    return (host, int(port), username, password_hash, certificate_path,
+            allow_insecure)
+
+
 class VsphereClient(object):
 
     def __init__(self, ctx_logger=None):
@@ -275,6 +326,11 @@ class VsphereClient(object):
                 'to true.'
             )
 
+        session_key = _session_key(host, port, username, password,
+                                   certificate_path, allow_insecure)
+        if self._reuse_session(session_key):
+            return self
+
         try:
             if allow_insecure:
                 self._logger.warn(
@@ -294,6 +350,7 @@ class VsphereClient(object):
                                        port=int(port),
                                        sslContext=ssl_context)
             atexit.register(Disconnect, self.si)
+            _get_sessions()[session_key] = self.si
             return self
         except vim.fault.InvalidLogin:
             raise NonRecoverableError(
@@ -312,6 +369,24 @@ class VsphereClient(object):
             else:
                 raise
 
+    def _reuse_session(self, session_key):
+        sessions = _get_sessions()
+        si = sessions.get(session_key)
+        if not si:
+            return False
+        try:
+            # Cheap round trip to confirm the session is still logged in and
+            # its connection is still open.
+            si.CurrentTime()
+        except (vmodl.MethodFault, socket.error, HTTPException) as err:
+            self._logger.debug(
+                'vSphere session is no longer usable, logging in again: '
+                '{err}'.format(err=text_type(err)))
+            del sessions[session_key]
+            return False
+        self.si = si
+        return True
+
     def is_server_suspended(self, server):
         return server.summary.runtime.powerState.lower() == "suspended"
 
@@ -382,11 +457,14 @@ class VsphereClient(object):
         object_keys.extend(props_dict.get('_values', []))
         if root_object:
             object_keys.extend(['id', 'obj'])
-        object_keys = set(object_keys)
-        obj = namedtuple(
-            obj_name,
-            object_keys,
-        )
+        object_keys = frozenset(object_keys)
+        obj = _cached_object_types.get((obj_name, object_keys))
+        if obj is None:
+            obj = namedtuple(
+                obj_name,
+                object_keys,
+            )
+            _cached_object_types[(obj_name, object_keys)] = obj
 
         args = {}
         for key in props_dict.get('_values', []):
@@ -816,21 +894,9 @@ class VsphereClient(object):
         )
 
     def _get_vms(self, use_cache=True, skip_broken_vms=True):
-        properties = [
-            'name',
-            'summary',
-            'config.hardware.device',
-            'config.hardware.memoryMB',
-            'config.hardware.numCPU',
-            'datastore',
-            'guest.guestState',
-            'guest.net',
-            'network',
-        ]
-
         return self._get_entity(
             entity_name='vm',
-            props=properties,
+            props=VM_PROPERTIES,
             vimtype=vim.VirtualMachine,
             use_cache=use_cache,
             other_entity_mappings={
@@ -843,6 +909,42 @@ class VsphereClient(object):
             skip_broken_objects=skip_broken_vms,
         )
 
+    def _refresh_vm(self, vm):
+        """
+            Get the current state of a single VM.
+            Only this VM is collected, its networks and datastores are
+            matched against the cached ones. Falls back to collecting all
+            VMs again if those changed in the meantime.
+        """
+        return self._refresh_vm_by_id(vm.id, vm.obj)
+
+    def _refresh_vm_by_id(self, vm_id, vm_obj=None):
+        """
+            Get the current state of the VM with the given ID, as
+            _refresh_vm does, when only the ID is known.
+        """
+        if vm_obj is None:
+            vm_obj = vim.VirtualMachine(vm_id, self.si._stub)
+        try:
+            results = self._collect_properties(
+                vim.VirtualMachine, path_set=VM_PROPERTIES, obj=vm_obj)
+            if results:
+                return self._make_cached_object(
+                    obj_name='vm',
+                    props_dict=self._convert_props_list_to_dict(
+                        VM_PROPERTIES),
+                    platform_results=results[0],
+                    other_entity_mappings={
+                        'static': {
+                            'network': self._get_networks(),
+                            'datastore': self._get_datastores(),
+                        },
+                    },
+                )
+        except (KeyError, OperationRetry):
+            pass
+        return self._get_obj_by_id(vim.VirtualMachine, vm_id, use_cache=False)
+
     def _get_computes(self, use_cache=True):
         properties = [
             'name',
@@ -977,7 +1079,7 @@ class VsphereClient(object):
                     vimtype=vimtype))
         return getter_method
 
-    def _collect_properties(self, obj_type, path_set=None):
+    def _collect_properties(self, obj_type, path_set=None, obj=None):
         """
         Collect properties for managed objects from a view ref
         Check the vSphere API documentation for example on retrieving
@@ -989,44 +1091,35 @@ class VsphereClient(object):
                                             navigation
             obj_type      (pyVmomi.vim.*): Type of managed object
             path_set               (list): List of properties to retrieve
+            obj     (pyVmomi.vim.*): Collect only this managed object
+                                     instead of all objects of obj_type
         Returns:
             A list of properties for the managed objects
         """
-        with _ContainerView([obj_type], self.si) as view_ref:
-            collector = self.si.content.propertyCollector
-
-            # Create object specification to define the starting point of
-            # inventory navigation
+        if obj is not None:
             obj_spec = vmodl.query.PropertyCollector.ObjectSpec()
-            obj_spec.obj = view_ref
-            obj_spec.skip = True
-
-            # Create a traversal specification to identify the path for
-            # collection
-            traversal_spec = vmodl.query.PropertyCollector.TraversalSpec()
-            traversal_spec.name = 'traverseEntities'
-            traversal_spec.path = 'view'
-            traversal_spec.skip = False
-            traversal_spec.type = view_ref.__class__
-            obj_spec.selectSet = [traversal_spec]
-
-            # Identify the properties to the retrieved
-            property_spec = vmodl.query.PropertyCollector.PropertySpec()
-            property_spec.type = obj_type
-
-            if not path_set:
-                property_spec.all = True
-
-            property_spec.pathSet = path_set
-
-            # Add the object and property specification to the
-            # property filter specification
-            filter_spec = vmodl.query.PropertyCollector.FilterSpec()
-            filter_spec.objectSet = [obj_spec]
-            filter_spec.propSet = [property_spec]
-
-            # Retrieve properties
-            props = collector.RetrieveContents([filter_spec])
+            obj_spec.obj = obj
+            obj_spec.skip = False
+            props = self._retrieve_contents(obj_spec, obj_type, path_set)
+        else:
+            with _ContainerView([obj_type], self.si) as view_ref:
+                # Create object specification to define the starting point
+                # of inventory navigation
+                obj_spec = vmodl.query.PropertyCollector.ObjectSpec()
+                obj_spec.obj = view_ref
+                obj_spec.skip = True
+
+                # Create a traversal specification to identify the path for
+                # collection
+                traversal_spec = \
+                    vmodl.query.PropertyCollector.TraversalSpec()
+                traversal_spec.name = 'traverseEntities'
+                traversal_spec.path = 'view'
+                traversal_spec.skip = False
+                traversal_spec.type = view_ref.__class__
+                obj_spec.selectSet = [traversal_spec]
+
+                props = self._retrieve_contents(obj_spec, obj_type, path_set)
 
         data = []
         for obj in props:
@@ -1040,6 +1133,27 @@ class VsphereClient(object):
 
         return data
 
+    def _retrieve_contents(self, obj_spec, obj_type, path_set=None):
+        collector = self.si.content.propertyCollector
+
+        # Identify the properties to the retrieved
+        property_spec = vmodl.query.PropertyCollector.PropertySpec()
+        property_spec.type = obj_type
+
+        if not path_set:
+            property_spec.all = True
+
+        property_spec.pathSet = path_set
+
+        # Add the object and property specification to the
+        # property filter specification
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec()
+        filter_spec.objectSet = [obj_spec]
+        filter_spec.propSet = [property_spec]
+
+        # Retrieve properties
+        return collector.RetrieveContents([filter_spec])
+
     def _get_entity_datacenter(self, obj):
         if isinstance(obj, vim.Datacenter):
             return obj
@@ -1058,22 +1172,57 @@ class VsphereClient(object):
 
         entities = self._get_getter_method(vimtype)(use_cache)
         name = self._get_normalised_name(name)
+        if not datacenter_name:
+            # Index the entities by name once per fetched list, as is done
+            # for IDs, keeping the first match for duplicated names.
+            cache_key = '{type}_by_name'.format(type=vimtype.__name__)
+            indexed, by_name = self._cache.get(cache_key, (None, None))
+            if indexed is not entities:
+                by_name = {}
+                for entity in entities:
+                    by_name.setdefault(entity.name.lower(), entity)
+                self._cache[cache_key] = (entities, by_name)
+            return by_name.get(name)
         for entity in entities:
             if name == entity.name.lower():
                 # check if we are looking inside specific datacenter
-                if datacenter_name:
-                    # get the entity datacenter via parent property
-                    entity_dc = self._get_entity_datacenter(entity)
-                    if entity_dc and entity_dc.name == datacenter_name:
-                        return entity
-                else:
+                # get the entity datacenter via parent property
+                entity_dc = self._get_entity_datacenter(entity)
+                if entity_dc and entity_dc.name == datacenter_name:
                     return entity
 
+    def _get_obj_ref_by_name(self, vimtype, name, use_cache=True):
+        """
+            Get the managed object reference of an entity by name.
+            Only the name property is collected, so this avoids building
+            the full cached objects when the reference is all that is needed.
+        """
+        cache_key = '{type}_refs'.format(type=vimtype.__name__)
+        if cache_key not in self._cache or not use_cache:
+            refs = {}
+            for item in self._collect_properties(vimtype, path_set=['name']):
+                # Keep the first match, as _get_obj_by_name does.
+                refs.setdefault(self._get_normalised_name(item['name']),
+                                item['obj'])
+            self._cache[cache_key] = refs
+        return self._cache[cache_key].get(self._get_normalised_name(name))
+
+    def _get_obj_id_by_name(self, vimtype, name, use_cache=True):
+        obj = self._get_obj_ref_by_name(vimtype, name, use_cache)
+        return obj._moId if obj else None
+
     def _get_obj_by_id(self, vimtype, id, use_cache=True):
         entities = self._get_getter_method(vimtype)(use_cache)
-        for entity in entities:
-            if entity.id == id:
-                return entity
+        # Index the entities by ID once per fetched list, so repeated
+        # lookups against the same cached list don't rescan it.
+        cache_key = '{type}_by_id'.format(type=vimtype.__name__)
+        indexed, by_id = self._cache.get(cache_key, (None, None))
+        if indexed is not entities:
+            by_id = {}
+            for entity in entities:
+                by_id.setdefault(entity.id, entity)
+            self._cache[cache_key] = (entities, by_id)
+        return by_id.get(id)
 
     def _wait_for_task(self,
                        task=None,
@@ -1121,13 +1270,17 @@ class VsphereClient(object):
 
         retry_count = max_wait_time // TASK_CHECK_SLEEP
 
-        while task.info.state in (vim.TaskInfo.State.queued,
+        # Every read of task.info is a round trip to vCenter, so fetch it
+        # once per poll rather than once per field.
+        task_info = task.info
+        while task_info.state in (vim.TaskInfo.State.queued,
                                   vim.TaskInfo.State.running):
             time.sleep(TASK_CHECK_SLEEP)
+            task_info = task.info
 
             self._logger.debug(
                 'Task state {state} left {step} seconds'.format(
-                    state=task.info.state,
+                    state=task_info.state,
                     step=(retry_count * TASK_CHECK_SLEEP)))
             # check async
             if instance and retry_count <= 0:
@@ -1145,14 +1298,14 @@ class VsphereClient(object):
             # save flag as current state before external call
             instance.update()
 
-        if task.info.state != vim.TaskInfo.State.success:
+        if task_info.state != vim.TaskInfo.State.success:
             raise NonRecoverableError(
                 "Error during executing task on vSphere: '{0}'".format(
-                    task.info.error))
+                    task_info.error))
         elif instance and resource_id:
             self._logger.info('Save resource_id {resource_id}'.format(
-                resource_id=task.info.result._moId))
-            instance.runtime_properties[resource_id] = task.info.result._moId
+                resource_id=task_info.result._moId))
+            instance.runtime_properties[resource_id] = task_info.result._moId
             # save flag as current state before external call
             instance.update()
 
@@ -1177,11 +1330,12 @@ class VsphereClient(object):
             if hasattr(dev, 'macAddress'):
                 nics.append(dev)
 
-        self._logger.debug('Got NICs: {nics}'.format(nics=nics))
+        # Device reprs are large, so leave formatting them to the logger,
+        # which skips it when debug output is off.
+        self._logger.debug('Got NICs: %s', nics)
         networks = []
         for nic in nics:
-            self._logger.debug('Checking details for NIC {nic}'
-                               .format(nic=nic))
+            self._logger.debug('Checking details for NIC %s', nic)
             distributed = hasattr(nic.backing, 'port') and isinstance(
                 nic.backing.port,
                 vim.dvs.PortConnection,
@@ -16,6 +16,7 @@ from __future__ import division
 
 # Stdlib imports
 import time
+import logging
 from netaddr import IPNetwork
 from pyVmomi import vim, vmodl
 
@@ -279,38 +280,54 @@ class ServerClient(VsphereClient):
             message = ' '.join(issues)
             raise NonRecoverableError(message)
 
-    def _add_network(self, network, datacenter, counter=0):
+    def _get_network_objs(self, networks, datacenter):
+        # The datacenter port groups are fetched once for all distributed
+        # networks rather than once per network.
+        port_groups = None
+        if any(network['switch_distributed'] for network in networks):
+            port_groups = datacenter.obj.network
+
+        network_objs = []
+        for network in networks:
+            network_name = network['name']
+            if network['switch_distributed']:
+                normalised_network_name = \
+                    self._get_normalised_name(network_name)
+                for port_group in port_groups:
+                    # Make sure that we are comparing normalised network names.
+                    normalised_port_group_name = self._get_normalised_name(
+                        port_group.name
+                    )
+                    if normalised_port_group_name == normalised_network_name:
+                        network_obj = \
+                            self._convert_vmware_port_group_to_cloudify(
+                                port_group)
+                        break
+                else:
+                    self._logger.warning(
+                        "Network {name} couldn't be found.  "
+                        "Only found {networks}.".format(
+                            name=network_name, networks=text_type([
+                                net.name for net in port_groups])))
+                    network_obj = None
+            else:
+                network_obj = self._get_obj_by_name(
+                    vim.Network,
+                    network_name,
+                )
+            if network_obj is None:
+                raise NonRecoverableError(
+                    'Network {0} could not be found'.format(network_name))
+            network_objs.append(network_obj)
+        return network_objs
+
+    def _add_network_spec(self, network, network_obj, counter=0):
         network_name = network['name']
         nsx_t_switch = network['nsx_t_switch']
-        normalised_network_name = self._get_normalised_name(network_name)
         switch_distributed = network['switch_distributed']
         mac_address = network.get('mac_address')
 
         use_dhcp = network['use_dhcp']
-        if switch_distributed:
-            for port_group in datacenter.obj.network:
-                # Make sure that we are comparing normalised network names.
-                normalised_port_group_name = self._get_normalised_name(
-                    port_group.name
-                )
-                if normalised_port_group_name == normalised_network_name:
-                    network_obj = \
-                        self._convert_vmware_port_group_to_cloudify(port_group)
-                    break
-            else:
-                self._logger.warning(
-                    "Network {name} couldn't be found.  Only found {networks}."
-                    .format(name=network_name, networks=text_type([
-                        net.name for net in datacenter.obj.network])))
-                network_obj = None
-        else:
-            network_obj = self._get_obj_by_name(
-                vim.Network,
-                network_name,
-            )
-        if network_obj is None:
-            raise NonRecoverableError(
-                'Network {0} could not be found'.format(network_name))
         nicspec = vim.vm.device.VirtualDeviceSpec()
         # Info level as this is something that was requested in the
         # blueprint
@@ -545,9 +562,11 @@ class ServerClient(VsphereClient):
             disk_provision_type=None,
             **_):
 
-        self._logger.debug(
-            "Entering create_server with parameters %s"
-            % prepare_for_log(locals()))
+        # Sanitising every argument is wasted work when debug is off.
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(
+                "Entering create_server with parameters %s",
+                prepare_for_log(locals()))
 
         # if we pass clone_vm and template_name was empty
         # assume that we will be cloning a VM not template
@@ -681,14 +700,13 @@ class ServerClient(VsphereClient):
                                   cdrom_image=cdrom_image,
                                   remove_networks=not postpone_delete_networks)
 
-        port_groups, distributed_port_groups = self._get_port_group_names()
-
-        netcnt = 0
-        for network in networks:
-            nicspec, guest_map = self._add_network(network, datacenter, netcnt)
+        network_objs = self._get_network_objs(networks, datacenter)
+        for netcnt, (network, network_obj) in enumerate(
+                zip(networks, network_objs)):
+            nicspec, guest_map = self._add_network_spec(
+                network, network_obj, netcnt)
             devices.append(nicspec)
             adaptermaps.append(guest_map)
-            netcnt += 1
 
         vmconf = vim.vm.ConfigSpec()
         vmconf.numCPUs = cpus
@@ -1072,7 +1090,7 @@ class ServerClient(VsphereClient):
     def delete_server(self, server, max_wait_time=300, **_):
         self._logger.debug("Entering server delete procedure.")
         if self.is_server_poweredon(server):
-            self.stop_server(server)
+            self.stop_server(server, max_wait_time=max_wait_time)
         task = server.obj.Destroy()
         self._wait_for_task(task, max_wait_time=max_wait_time)
         self._logger.debug("Server is now deleted.")
@@ -1599,38 +1617,44 @@ class ServerClient(VsphereClient):
                 config.memoryMB = memory
                 update_required = True
 
+        if not update_required:
+            self._logger.debug(
+                "Server '%s' already has the requested configuration."
+                % server.name)
+            return False
+
         ctx.logger.debug('New configuration: {}'.format(config))
 
-        if update_required:
-            task = server.obj.Reconfigure(spec=config)
+        task = server.obj.Reconfigure(spec=config)
 
-            try:
-                self._wait_for_task(task, max_wait_time=max_wait_time)
-            except NonRecoverableError as e:
-                if 'configSpec.memoryMB' in e.args[0]:
-                    raise NonRecoverableError(
-                        "Memory error resizing Server. May be caused by "
-                        "https://kb.vmware.com/kb/2008405 . If so the Server "
-                        "may be resized while it is switched off.", e)
-                raise
+        try:
+            self._wait_for_task(task, max_wait_time=max_wait_time)
+        except NonRecoverableError as e:
+            if 'configSpec.memoryMB' in e.args[0]:
+                raise NonRecoverableError(
+                    "Memory error resizing Server. May be caused by "
+                    "https://kb.vmware.com/kb/2008405 . If so the Server "
+                    "may be resized while it is switched off.", e)
+            raise
 
         self._logger.debug(
             "Server '%s' resized with new number of "
             "CPUs: %s and RAM: %s." % (server.name, cpus, memory))
+        return True
 
     def get_server_ip(self, vm, network_name, ignore_local=True):
         self._logger.debug(
             'Getting server IP from {network}.'.format(network=network_name))
 
+        network_name = network_name.lower()
         for network in vm.guest.net:
             if not network.network:
                 self._logger.warn(
                     'Ignoring device with MAC {mac} as it is not on a '
                     'vSphere network.'.format(mac=network.macAddress))
                 continue
-            if network.network and \
-                    network_name.lower() == self._get_normalised_name(
-                        network.network) and len(network.ipAddress) > 0:
+            if network_name == self._get_normalised_name(
+                    network.network) and len(network.ipAddress) > 0:
                 ip_address = get_ip_from_vsphere_nic_ips(network, ignore_local)
                 # This should be debug, but left as info until CFY-4867 makes
                 # logs more visible
@@ -1710,14 +1734,16 @@ class ServerClient(VsphereClient):
         )
         return vmware_resource
 
+    def get_resource_pool_id_by_name(self, pool_name):
+        return self._get_obj_id_by_name(vim.ResourcePool, pool_name)
+
     def delete_resource_pool(self, pool_name, max_wait_time=300, **_):
-        vmware_resource = self._get_obj_by_name(
-            vim.ResourcePool,
-            pool_name,
-        )
-        if not vmware_resource:
+        # Only the reference is needed to destroy the pool, so skip building
+        # the full resource pool tree.
+        resource_pool = self._get_obj_ref_by_name(vim.ResourcePool, pool_name)
+        if not resource_pool:
             self._logger.debug("Resource Pool is not found to delete.")
         else:
-            task = vmware_resource.obj.Destroy()
+            task = resource_pool.Destroy()
             self._wait_for_task(task, max_wait_time=max_wait_time)
             self._logger.debug("Resource Pool is now deleted.")
@@ -31,6 +31,10 @@ from . import VsphereClient
 from .._compat import text_type
 from ..utils import prepare_for_log
 
+# Disk backing file names, compiled once rather than per device.
+VMDK_FILENAME = re.compile('^(\\[.*\\]\\s+.*\\/.*)\\.vmdk$')
+VMDK_INCREMENTED_FILENAME = re.compile('^(.*)_([0-9]+)\\.vmdk$')
+
 
 class RawVolumeClient(VsphereClient):
 
@@ -170,12 +174,10 @@ class StorageClient(VsphereClient):
                 if isinstance(vm_device, vim.vm.device.VirtualDisk):
                     # Generate filename (add increment to VMDK base name)
                     vm_disk_filename_cur = vm_device.backing.fileName
-                    p = re.compile('^(\\[.*\\]\\s+.*\\/.*)\\.vmdk$')
-                    m = p.match(vm_disk_filename_cur)
+                    m = VMDK_FILENAME.match(vm_disk_filename_cur)
                     if vm_disk_filename is None:
                         vm_disk_filename = m.group(1)
-                    p = re.compile('^(.*)_([0-9]+)\\.vmdk$')
-                    m = p.match(vm_disk_filename_cur)
+                    m = VMDK_INCREMENTED_FILENAME.match(vm_disk_filename_cur)
                     if m:
                         if m.group(2) is not None:
                             increment = int(m.group(2))
@@ -12,15 +12,25 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import socket
 import unittest
+import threading
 
-from mock import Mock, MagicMock, patch
+from mock import Mock, MagicMock, PropertyMock, patch
 
-from .. import ServerClient
+from pyVmomi import vim
+
+from cloudify.exceptions import NonRecoverableError
+
+from .. import ServerClient, clients
 
 
 class PluginCommonUnitTests(unittest.TestCase):
 
+    def setUp(self):
+        super(PluginCommonUnitTests, self).setUp()
+        clients.reset_sessions()
+
     @patch('vsphere_plugin_common.clients.server.get_ip_from_vsphere_nic_ips')
     def test_get_server_ip(self, get_ip_from_nic_mock):
         client = ServerClient()
@@ -56,6 +66,181 @@ class PluginCommonUnitTests(unittest.TestCase):
             get_ip_from_nic_mock.return_value,
             res)
 
+    def test_get_server_by_id(self):
+        client = ServerClient()
+        vms = [Mock(id='vm-1'), Mock(id='vm-2')]
+        client._get_vms = Mock(return_value=vms)
+
+        self.assertEqual(vms[1], client.get_server_by_id('vm-2'))
+        self.assertEqual(vms[0], client.get_server_by_id('vm-1'))
+        self.assertIsNone(client.get_server_by_id('vm-3'))
+
+        # a refreshed VM list is indexed again
+        client._get_vms.return_value = [Mock(id='vm-3')]
+        self.assertEqual(client._get_vms.return_value[0],
+                         client.get_server_by_id('vm-3'))
+
+    def test_get_obj_by_name(self):
+        client = ServerClient()
+        datacenters = [Mock(), Mock(), Mock()]
+        for datacenter, name in zip(datacenters, ('DC1', 'dc2', 'dc1')):
+            datacenter.name = name
+        client._get_datacenters = Mock(return_value=datacenters)
+
+        self.assertEqual(datacenters[0],
+                         client._get_obj_by_name(vim.Datacenter, 'dc1'))
+        self.assertEqual(datacenters[1],
+                         client._get_obj_by_name(vim.Datacenter, 'DC2'))
+        self.assertIsNone(client._get_obj_by_name(vim.Datacenter, 'dc3'))
+
+        # a refreshed list is indexed again
+        client._get_datacenters.return_value = datacenters[1:]
+        self.assertEqual(datacenters[2],
+                         client._get_obj_by_name(vim.Datacenter, 'dc1'))
+
+    def test_refresh_vm(self):
+        client = ServerClient()
+        client.si = Mock()
+        network = Mock(id='network-1')
+        datastore = Mock(id='datastore-1')
+        client._get_networks = Mock(return_value=[network])
+        client._get_datastores = Mock(return_value=[datastore])
+        client._get_vms = Mock()
+        vm_obj = vim.VirtualMachine('vm-1')
+        prop_values = {
+            'name': 'vm',
+            'summary': Mock(),
+            'config.changeVersion': '1',
+            'config.hardware.device': [],
+            'config.hardware.memoryMB': 1024,
+            'config.hardware.numCPU': 1,
+            'datastore': [Mock(_moId='datastore-1')],
+            'guest.guestState': 'running',
+            'guest.net': [],
+            'network': [Mock(_moId='network-1')],
+        }
+        prop_set = []
+        for name, val in prop_values.items():
+            prop = Mock(val=val)
+            prop.name = name
+            prop_set.append(prop)
+        client.si.content.propertyCollector.RetrieveContents.return_value = [
+            Mock(obj=vm_obj, propSet=prop_set)]
+
+        vm = client._refresh_vm(Mock(id='vm-1', obj=vm_obj))
+        self.assertEqual('vm-1', vm.id)
+        self.assertEqual('vm', vm.name)
+        self.assertEqual([network], vm.network)
+        self.assertEqual([datastore], vm.datastore)
+        self.assertEqual(1024, vm.config.hardware.memoryMB)
+        client._get_vms.assert_not_called()
+
+        # a VM known only by its ID is collected the same way
+        self.assertEqual('vm', client._refresh_vm_by_id('vm-1').name)
+        filter_spec, = client.si.content.propertyCollector.\
+            RetrieveContents.call_args[0][0]
+        self.assertEqual('vm-1', filter_spec.objectSet[0].obj._moId)
+        client._get_vms.assert_not_called()
+
+        # the VM refers to a network missing from the cache
+        prop_values['network'][0]._moId = 'network-2'
+        client._get_vms.return_value = [Mock(id='vm-1')]
+        self.assertEqual(client._get_vms.return_value[0],
+                         client._refresh_vm(Mock(id='vm-1', obj=vm_obj)))
+        client._get_vms.assert_called_once_with(False)
+
+    def test_get_network_objs(self):
+        client = ServerClient()
+        client._get_obj_by_name = Mock(return_value='standard')
+        client._convert_vmware_port_group_to_cloudify = Mock(
+            side_effect=lambda port_group: port_group)
+        port_group = Mock()
+        port_group.name = 'Distributed'
+        datacenter = Mock()
+        type(datacenter.obj).network = network_property = \
+            PropertyMock(return_value=[port_group])
+        networks = [
+            {'name': 'distributed', 'switch_distributed': True},
+            {'name': 'Standard', 'switch_distributed': False},
+            {'name': 'Distributed', 'switch_distributed': True},
+        ]
+
+        self.assertEqual([port_group, 'standard', port_group],
+                         client._get_network_objs(networks, datacenter))
+        # port groups are only fetched once for all distributed networks
+        network_property.assert_called_once_with()
+        client._get_obj_by_name.assert_called_once_with(
+            vim.Network, 'Standard')
+
+        with self.assertRaisesRegexp(NonRecoverableError,
+                                     'Network missing could not be found'):
+            client._get_network_objs(
+                [{'name': 'missing', 'switch_distributed': True}],
+                datacenter)
+
+    def test_delete_resource_pool(self):
+        client = ServerClient()
+        pool = Mock()
+        client._collect_properties = Mock(
+            return_value=[{'name': 'Pool', 'obj': pool}])
+        client._wait_for_task = Mock()
+
+        client.delete_resource_pool('missing')
+        pool.Destroy.assert_not_called()
+
+        client.delete_resource_pool('pool', max_wait_time=42)
+        client._wait_for_task.assert_called_once_with(
+            pool.Destroy.return_value, max_wait_time=42)
+        client._collect_properties.assert_called_once()
+
+    @patch('vsphere_plugin_common.clients.atexit', Mock())
+    @patch('vsphere_plugin_common.clients.SmartConnectNoSSL')
+    def test_connect_reuses_session(self, smart_m):
+        cfg = {
+            'host': 'vcenter_ip',
+            'username': 'vcenter_user',
+            'password': 'vcenter_password',
+            'port': 443,
+            'allow_insecure': True,
+        }
+        first = ServerClient().connect(cfg)
+        second = ServerClient().connect(cfg)
+        self.assertEqual(1, smart_m.call_count)
+        self.assertIs(first.si, second.si)
+
+        # expired sessions are replaced
+        first.si.CurrentTime.side_effect = vim.fault.NotAuthenticated
+        smart_m.return_value = Mock()
+        third = ServerClient().connect(cfg)
+        self.assertEqual(2, smart_m.call_count)
+        self.assertIs(smart_m.return_value, third.si)
+
+        # so are sessions whose connection was dropped
+        third.si.CurrentTime.side_effect = socket.error
+        smart_m.return_value = Mock()
+        fourth = ServerClient().connect(cfg)
+        self.assertEqual(3, smart_m.call_count)
+        self.assertIs(smart_m.return_value, fourth.si)
+
+        # the password is only kept as a hash
+        for session_key in clients._get_sessions():
+            self.assertNotIn('vcenter_password', session_key)
+
+        # sessions are not shared with other threads
+        thread = threading.Thread(target=ServerClient().connect, args=(cfg,))
+        thread.start()
+        thread.join()
+        self.assertEqual(4, smart_m.call_count)
+
+    def test_resize_server_unchanged(self):
+        client = ServerClient()
+        server = Mock()
+        server.config.hardware.numCPU = 2
+        server.config.hardware.memoryMB = 1024
+
+        self.assertFalse(client.resize_server(server, cpus=2, memory=1024))
+        server.obj.Reconfigure.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -25,7 +25,7 @@ from mock import Mock, MagicMock, patch, call
 from cloudify.state import current_ctx
 from cloudify.exceptions import NonRecoverableError, OperationRetry
 
-from .. import (VsphereClient, ServerClient)
+from .. import (VsphereClient, ServerClient, clients)
 
 from ..clients import vim
 from .._compat import (
@@ -121,6 +121,7 @@ class VspherePluginsCommonTests(unittest.TestCase):
 
     def setUp(self):
         super(VspherePluginsCommonTests, self).setUp()
+        clients.reset_sessions()
         self.mock_ctx = MagicMock()
         current_ctx.set(self.mock_ctx)
 
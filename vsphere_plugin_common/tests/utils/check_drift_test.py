@@ -1,4 +1,4 @@
-from mock import Mock
+from mock import Mock, patch
 from pytest import fixture
 from cloudify.state import current_ctx
 from ...utils import check_drift
@@ -46,3 +46,16 @@ def test_check_drift2(ctx):
     current_configuration = {"a": "a"}
     assert check_drift(logger, expected_configuration,
                        current_configuration) != {}
+
+
+def test_check_drift_equal_skips_diff(ctx):
+    logger = get_logger(False)
+    with patch('vsphere_plugin_common.utils.compare_configuration') as diff:
+        assert check_drift(logger, {"a": ["a", "b"]},
+                           {"a": ["a", "b"]}) == {}
+        diff.assert_not_called()
+
+
+def test_check_drift_ignores_order(ctx):
+    logger = get_logger(False)
+    assert check_drift(logger, {"a": ["a", "b"]}, {"a": ["b", "a"]}) == {}
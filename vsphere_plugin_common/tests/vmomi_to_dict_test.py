@@ -0,0 +1,40 @@
+#########
+# Copyright (c) 2014-2020 Cloudify Platform Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+from pyVmomi import vim, VmomiSupport
+
+from ..utils import vmomi_to_dict
+
+
+class VmomiToDictTest(unittest.TestCase):
+
+    def test_vmomi_to_dict(self):
+        config = vim.vm.ConfigSpec(name='vm', numCPUs=2, memoryMB=1024)
+        converted = vmomi_to_dict({'summary': config, 'network': []})
+        self.assertEqual({
+            'summary': json.loads(json.dumps(
+                config, cls=VmomiSupport.VmomiJSONEncoder,
+                sort_keys=True, indent=4)),
+            'network': [],
+        }, converted)
+        self.assertEqual('vm', converted['summary']['name'])
+        self.assertEqual(2, converted['summary']['numCPUs'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,11 +14,13 @@
 # limitations under the License.
 
 import re
+import json
 import logging
 
 from functools import wraps
 from inspect import getargspec
 from deepdiff import DeepDiff
+from pyVmomi import VmomiSupport
 
 from cloudify import ctx
 from cloudify.decorators import operation
@@ -182,6 +184,15 @@ def prepare_for_log(inputs):
     return result
 
 
+def vmomi_to_dict(obj):
+    """Convert pyVmomi data objects to plain dicts, lists and scalars.
+    Uses the same encoding as VmomiJSONEncoder, without the pretty printing.
+    """
+    return json.loads(json.dumps(obj,
+                                 cls=VmomiSupport.VmomiJSONEncoder,
+                                 separators=(',', ':')))
+
+
 def assign_expected_configuration(iface, runtime_props, prop=None):
     # assign_parameter(iface, 'expected_configuration', runtime_props, prop)
     pass
@@ -199,6 +210,11 @@ def check_drift(logger, expected_configuration, current_configuration):
         expected_configuration))
     ctx.logger.debug("Current configuration: {}".format(
         current_configuration))
+    if expected_configuration == current_configuration:
+        # Nothing to look for, skip the order insensitive deep diff.
+        logger.info(
+            'Configuration has not drifted.')
+        return {}
     result = compare_configuration(expected_configuration,
                                    current_configuration)
     if result:
@@ -13,11 +13,11 @@
 # limitations under the License.
 
 import re
-import uuid
+import random
+import logging
 
 # Third party imports
-import json
-from pyVmomi import vim, VmomiSupport
+from pyVmomi import vim
 
 # Cloudify imports
 import time
@@ -32,6 +32,7 @@ from vsphere_plugin_common.utils import (
     op,
     is_node_deprecated,
     prepare_for_log,
+    vmomi_to_dict,
     find_rels_by_type
 )
 from vsphere_plugin_common.constants import (
@@ -51,6 +52,29 @@ from vsphere_plugin_common.utils import check_drift as utils_check_drift
 RELATIONSHIP_VM_TO_NIC = \
     'cloudify.relationships.vsphere.server_connected_to_nic'
 
+VM_NAME_INVALID_CHARACTERS = re.compile(r'[^A-Za-z0-9\-]')
+
+# Expected type and default value of each connect_networks key.
+CONNECT_NETWORK_VALIDATIONS = {
+    'name': (text_type, None),
+    'from_relationship': (bool, False),
+    'external': (bool, False),
+    'management': (bool, False),
+    'switch_distributed': (bool, False),
+    'nsx_t_switch': (bool, False),
+    'use_dhcp': (bool, True),
+    'network': (text_type, None),
+    'gateway': (text_type, None),
+    'ip': (text_type, None)
+}
+CONNECT_NETWORK_KEYS = frozenset(CONNECT_NETWORK_VALIDATIONS)
+# Flags that at most one of the connected networks may have set.
+UNIQUE_NETWORK_FLAGS = ('external', 'management')
+# Stands in for NICs not on any stored network, so check_drift reports them.
+UNMATCHED_NETWORK = '__unmatched__'
+# The VM config.changeVersion the expected configuration was taken at.
+EXPECTED_CONFIGURATION_VERSION = 'expected_configuration_version'
+
 
 def get_connected_networks(nics_from_props):
     """ Create a list of dictionaries that merges nics specified
@@ -62,40 +86,45 @@ def get_connected_networks(nics_from_props):
         defined under connect_networks in _networking.
     """
 
-    if VSPHERE_SERVER_CONNECTED_NICS not in ctx.instance.runtime_properties:
-        ctx.instance.runtime_properties[VSPHERE_SERVER_CONNECTED_NICS] = []
-    # get all relationship contexts of related nics
-    nics_from_rels = find_rels_by_type(ctx.instance, RELATIONSHIP_VM_TO_NIC)
-    for rel_nic in nics_from_rels:
+    runtime_properties = ctx.instance.runtime_properties
+    if VSPHERE_SERVER_CONNECTED_NICS not in runtime_properties:
+        runtime_properties[VSPHERE_SERVER_CONNECTED_NICS] = []
+    # Index the nics from props that should be filled in from a relationship,
+    # so each related nic is matched with a single lookup.
+    nics_to_merge = {}
+    for prop_nic in nics_from_props:
+        if prop_nic.get('from_relationship'):
+            nics_to_merge.setdefault(prop_nic.get('name'), prop_nic)
+    # go over all relationship contexts of related nics
+    for rel_nic in find_rels_by_type(ctx.instance, RELATIONSHIP_VM_TO_NIC):
+        nic_instance = rel_nic.target.instance
+        nic_properties = nic_instance.runtime_properties
         # try to get the connect_network property from the nic.
-        _connect_network = rel_nic.target.instance.runtime_properties.get(
-            'connected_network')
+        _connect_network = nic_properties.get('connected_network')
         if not _connect_network:
             raise NonRecoverableError(
                 'No "connect_network" specification for nic {0}.'.format(
-                    rel_nic.target.instance.id))
+                    nic_instance.id))
         connected_network_name = _connect_network.get(
-            'name',
-            rel_nic.target.instance.runtime_properties.get('name'))
+            'name', nic_properties.get('name'))
         # If it wasn't provided it's not a valid nic.
         if not connected_network_name:
             raise NonRecoverableError(
                 'No network name specified for nic {0}.'.format(
-                    rel_nic.target.instance.id))
+                    nic_instance.id))
         _connect_network['name'] = connected_network_name
 
-        for prop_nic in nics_from_props:
-            # If there is a nic from props that is supposed
-            # to use a nic from relationships do so.
-            if _connect_network['name'] == prop_nic['name'] and \
-                    prop_nic.get('from_relationship'):
-                # Merge them.
-                prop_nic.update(_connect_network)
-                # We can move on to the next nic in the nics_from_props list.
-        # Otherwise go head and add it to the list.
-        nics_from_props.append(_connect_network)
-        ctx.instance.runtime_properties[VSPHERE_SERVER_CONNECTED_NICS].append(
-            rel_nic.target.instance.id)
+        # If there is a nic from props that is supposed
+        # to use a nic from relationships do so.
+        prop_nic = nics_to_merge.get(connected_network_name)
+        if prop_nic:
+            # Merge them.
+            prop_nic.update(_connect_network)
+        else:
+            # Otherwise go head and add it to the list.
+            nics_from_props.append(_connect_network)
+        runtime_properties[VSPHERE_SERVER_CONNECTED_NICS].append(
+            nic_instance.id)
     return nics_from_props
 
 
@@ -107,23 +136,12 @@ def validate_connect_network(_network):
     """
 
     # The charges.
-    network_validations = {
-        'name': (text_type, None),
-        'from_relationship': (bool, False),
-        'external': (bool, False),
-        'management': (bool, False),
-        'switch_distributed': (bool, False),
-        'nsx_t_switch': (bool, False),
-        'use_dhcp': (bool, True),
-        'network': (text_type, None),
-        'gateway': (text_type, None),
-        'ip': (text_type, None)
-    }
+    valid_keys = CONNECT_NETWORK_KEYS
 
     # Assumed innocent until proven guilty.
     validation_error = False
     # As proper bureaucrats, we always prepare lists.
-    validation_error_messages = ['Network failed validation: ']
+    validation_error_messages = []
 
     if _network.get('switch_distributed') and _network.get('nsx_t_switch'):
         validation_error = True
@@ -135,20 +153,18 @@ def validate_connect_network(_network):
         validation_error = True
         validation_error_messages.append(
             'All networks connected to a server must have a name specified.')
-        del network_validations['name']
+        valid_keys = valid_keys - {'name'}
 
     # We review each charge as a distinct offense.
-    for key, value in list(_network.items()):
-        try:
-            # We check if the defendant has an alibi.
-            expected_type, default_value = network_validations.pop(key)
-        except KeyError:
+    for key, value in _network.items():
+        if key not in valid_keys:
             # The defendant is lying.
             validation_error = True
             validation_error_messages.append(
                 'Network has unsupported key: {0}. Value: {1}'.format(
                     key, value))
             continue
+        expected_type, default_value = CONNECT_NETWORK_VALIDATIONS[key]
 
         # The defendant was not even at the scene of the crime.
         if not value and expected_type != bool:
@@ -163,11 +179,14 @@ def validate_connect_network(_network):
                     key, expected_type, _network[key]))
 
     if validation_error:
-        raise NonRecoverableError(text_type(validation_error_messages))
+        raise NonRecoverableError(
+            'Network failed validation: ' +
+            '; '.join(validation_error_messages))
 
     # We return the citizen its rights.
-    for validation_key, (_, default_value) in network_validations.items():
-        _network[validation_key] = default_value
+    for validation_key, (_, default_value) in \
+            CONNECT_NETWORK_VALIDATIONS.items():
+        _network.setdefault(validation_key, default_value)
 
     return _network
 
@@ -175,35 +194,47 @@ def validate_connect_network(_network):
 def handle_networks(networking_parameters):
     connect_networks = get_connected_networks(
         networking_parameters.get('connect_networks', []))
-    ctx.logger.debug(
-        'Network properties: {properties} {connect_networks}'.format(
-            properties=prepare_for_log(networking_parameters),
-            connect_networks=connect_networks
+    if not connect_networks:
+        return []
+
+    if ctx.logger.isEnabledFor(logging.DEBUG):
+        ctx.logger.debug(
+            'Network properties: {properties} {connect_networks}'.format(
+                properties=prepare_for_log(networking_parameters),
+                connect_networks=connect_networks
+            )
         )
-    )
-    if connect_networks:
-        err_msg = "No more than one %s network can be specified."
-        if len([n for n in connect_networks if
-                n.get('external', False)]) > 1:
-            raise NonRecoverableError(err_msg % 'external')
-        if len([n for n in connect_networks if
-                n.get('management', False)]) > 1:
-            raise NonRecoverableError(err_msg % 'management')
-
-        reordered_networks = []
-        for network in connect_networks:
-            ctx.logger.info('connected_network: {0}'.format(network))
-            validate_connect_network(network)
-            if network['external']:
-                reordered_networks.insert(0, network)
-            else:
-                reordered_networks.append(network)
-        connect_networks = reordered_networks
-    return connect_networks
+    # Validate, check the limits and put the external network first in
+    # a single pass. The networks were already logged above.
+    err_msg = "No more than one %s network can be specified."
+    external_networks = []
+    other_networks = []
+    flags_set = set()
+    for network in connect_networks:
+        validate_connect_network(network)
+        for flag in UNIQUE_NETWORK_FLAGS:
+            if network[flag]:
+                if flag in flags_set:
+                    raise NonRecoverableError(err_msg % flag)
+                flags_set.add(flag)
+        if network['external']:
+            external_networks.append(network)
+        else:
+            other_networks.append(network)
+    return external_networks + other_networks
+
+
+def get_network_name_by_flag(networks, flag):
+    """Name of the connected network with flag set, if any.
+    handle_networks allows no more than one network per UNIQUE_NETWORK_FLAGS
+    flag, so the first one found is the only one.
+    """
+    return next((network['name'] for network in networks
+                 if network.get(flag, False)), None)
 
 
-def validate_vm_name(vm_name, search=re.compile(r'[^A-Za-z0-9\-]').search):
-    if bool(search(vm_name)):
+def validate_vm_name(vm_name):
+    if VM_NAME_INVALID_CHARACTERS.search(vm_name):
         raise NonRecoverableError(
             'Computer name must contain only A-Z, a-z, 0-9, '
             'and hyphens ("-"), and must not consist entirely of '
@@ -212,25 +243,30 @@ def validate_vm_name(vm_name, search=re.compile(r'[^A-Za-z0-9\-]').search):
 
 
 def store_server_details(server_client, server_obj):
-    ctx.instance.runtime_properties[VSPHERE_SERVER_HOST] = text_type(
+    runtime_properties = ctx.instance.runtime_properties
+    runtime_properties[VSPHERE_SERVER_HOST] = text_type(
         server_obj.summary.runtime.host.name)
-    ctx.instance.runtime_properties[VSPHERE_SERVER_ID] = server_obj.id
-    ctx.instance.runtime_properties['name'] = server_obj.name
-    ctx.instance.runtime_properties[VSPHERE_SERVER_DATASTORE] = [
-        datastore.name for datastore in server_obj.datastore]
-    ctx.instance.runtime_properties[VSPHERE_SERVER_DATASTORE_IDS] = [
-        datastore.id for datastore in server_obj.datastore]
-    ctx.instance.runtime_properties[NETWORKS] = \
+    runtime_properties[VSPHERE_SERVER_ID] = server_obj.id
+    runtime_properties['name'] = server_obj.name
+    datastore_names = []
+    datastore_ids = []
+    for datastore in server_obj.datastore:
+        datastore_names.append(datastore.name)
+        datastore_ids.append(datastore.id)
+    runtime_properties[VSPHERE_SERVER_DATASTORE] = datastore_names
+    runtime_properties[VSPHERE_SERVER_DATASTORE_IDS] = datastore_ids
+    runtime_properties[NETWORKS] = \
         server_client.get_vm_networks(server_obj)
 
 
 def get_vm_name(server, os_family):
-    ctx.logger.debug('Server properties: {properties}'.format(
-        properties=prepare_for_log(server)))
     # If we've already set the name on this instance, use that.
     vm_name = ctx.instance.runtime_properties.get('name')
     if vm_name is not None:
         return vm_name
+    if ctx.logger.isEnabledFor(logging.DEBUG):
+        ctx.logger.debug('Server properties: {properties}'.format(
+            properties=prepare_for_log(server)))
 
     # Gather up the details that we will use to select a name.
     configured_name = server.get('name')
@@ -251,19 +287,17 @@ def get_vm_name(server, os_family):
 
     vm_name = '-'.join([name_prefix, id_suffix])
 
-    if '_' in vm_name:
-        orig = vm_name
-        vm_name = vm_name.replace('_', '-')
+    new_name = vm_name.replace('_', '-')
+    if new_name != vm_name:
         ctx.logger.warn(
-            'Changing all _ to - in VM name. Name changed from {orig} to '
-            '{new}.'.format(
-                orig=orig,
-                new=vm_name,
-            )
-        )
+            'Changing all _ to - in VM name. Name changed from %s to %s.',
+            vm_name, new_name)
+        vm_name = new_name
     validate_vm_name(vm_name)
     ctx.logger.info('Creating new server with name: {name}'.format(
         name=vm_name))
+    # Later calls in this and following operations reuse the name as is.
+    ctx.instance.runtime_properties['name'] = vm_name
     return vm_name
 
 
@@ -282,6 +316,13 @@ def get_server_by_context(server_client, server, os_family=None):
         'os_family must be provided if the VM might not exist')
 
 
+def _as_list(value):
+    """Wrap a single name in a list, leave lists and None as they are."""
+    if isinstance(value, text_type):
+        return [value]
+    return value
+
+
 def create_new_server(server_client,
                       server,
                       networking,
@@ -307,22 +348,20 @@ def create_new_server(server_client,
     ctx.logger.debug('Cdrom path: {cdrom}'.format(cdrom=cdrom_image))
 
     networks = handle_networks(networking)
-    if isinstance(allowed_hosts, text_type):
-        allowed_hosts = [allowed_hosts]
-    if isinstance(allowed_clusters, text_type):
-        allowed_clusters = [allowed_clusters]
-    if isinstance(allowed_datastores, text_type):
-        allowed_datastores = [allowed_datastores]
+    allowed_hosts = _as_list(allowed_hosts)
+    allowed_clusters = _as_list(allowed_clusters)
+    allowed_datastores = _as_list(allowed_datastores)
 
+    connection_config = server_client.cfg
     server_obj = server_client.create_server(
         # auto_placement deprecated- deprecation warning emitted where it is
         # actually used.
-        auto_placement=server_client.cfg.get('auto_placement', True),
+        auto_placement=connection_config.get('auto_placement', True),
         cpus=server.get('cpus'),
-        datacenter_name=server_client.cfg['datacenter_name'],
+        datacenter_name=connection_config['datacenter_name'],
         memory=server.get('memory'),
         networks=networks,
-        resource_pool_name=server_client.cfg['resource_pool_name'],
+        resource_pool_name=connection_config['resource_pool_name'],
         template_name=server.get('template'),
         vm_name=vm_name,
         windows_password=windows_password,
@@ -349,50 +388,36 @@ def create_new_server(server_client,
     return server_obj
 
 
-@op
-@with_server_client
-def create(server_client,
-           server,
-           networking,
-           allowed_hosts,
-           allowed_clusters,
-           allowed_datastores,
-           os_family,
-           windows_password,
-           windows_organization,
-           windows_timezone,
-           agent_config,
-           custom_sysprep,
-           custom_attributes,
-           use_external_resource,
-           enable_start_vm=False,
-           minimal_vm_version=13,
-           postpone_delete_networks=False,
-           cdrom_image=None,
-           vm_folder=None,
-           extra_config=None,
-           max_wait_time=300,
-           **_):
-    is_node_deprecated(ctx.node.type)
-    if enable_start_vm:
-        ctx.logger.debug('Create operation ignores enable_start_vm property.')
-        enable_start_vm = False
-
-    default_props = False
-    if server:
-        default_props = len(server.keys()) == 1 \
-            and 'add_scale_suffix' in server
-    if (not server or default_props) and not networking:
-        ctx.logger.debug('Create ignored because of empty properties')
-        return
-
+def _create_or_start(server_client,
+                     server,
+                     networking,
+                     allowed_hosts,
+                     allowed_clusters,
+                     allowed_datastores,
+                     os_family,
+                     windows_password,
+                     windows_organization,
+                     windows_timezone,
+                     agent_config,
+                     custom_sysprep,
+                     custom_attributes,
+                     use_external_resource,
+                     enable_start_vm,
+                     minimal_vm_version,
+                     postpone_delete_networks,
+                     cdrom_image,
+                     vm_folder,
+                     extra_config,
+                     max_wait_time,
+                     is_start):
+    runtime_properties = ctx.instance.runtime_properties
     ctx.logger.debug("Checking whether server exists...")
     if use_external_resource and "name" in server:
         server_obj = server_client.get_server_by_name(server.get('name'))
         if not server_obj:
             raise NonRecoverableError(
                 'A VM with name {0} was not found.'.format(server.get('name')))
-        ctx.instance.runtime_properties[VSPHERE_RESOURCE_EXTERNAL] = True
+        runtime_properties[VSPHERE_RESOURCE_EXTERNAL] = True
     elif 'template' not in server and 'clone_vm' not in server:
         raise NonRecoverableError('No template/clone_vm provided.')
     else:
@@ -419,26 +444,100 @@ def create(server_client,
             enable_start_vm=enable_start_vm,
             postpone_delete_networks=postpone_delete_networks,
             max_wait_time=max_wait_time)
+    elif is_start:
+        server_client.update_server(server=server_obj,
+                                    cdrom_image=cdrom_image,
+                                    extra_config=extra_config,
+                                    max_wait_time=max_wait_time)
+        if enable_start_vm:
+            ctx.logger.info("Server already exists, powering on.")
+            server_client.start_server(server=server_obj,
+                                       max_wait_time=max_wait_time)
+            ctx.logger.info("Server powered on.")
+        else:
+            ctx.logger.info("Server already exists, but will not be powered"
+                            "on as enable_start_vm is set to false")
 
     server_client.add_custom_values(server_obj, custom_attributes or {})
 
     # update vm version
     server_client.upgrade_server(server_obj,
-                                 minimal_vm_version=minimal_vm_version)
+                                 minimal_vm_version=minimal_vm_version,
+                                 max_wait_time=max_wait_time)
 
     # remove nic's by mac
-    keys_for_remove = ctx.instance.runtime_properties.get('_keys_for_remove')
+    keys_for_remove = runtime_properties.get('_keys_for_remove')
     if keys_for_remove:
         ctx.logger.info("Remove devices: {keys}".format(keys=keys_for_remove))
         server_client.remove_nic_keys(server_obj, keys_for_remove)
-        del ctx.instance.runtime_properties['_keys_for_remove']
-        ctx.instance.runtime_properties.dirty = True
-        ctx.instance.update()
+        # Persisted together with the server details below.
+        del runtime_properties['_keys_for_remove']
+    # Assigning the details marks the runtime properties dirty.
     store_server_details(server_client, server_obj)
-    ctx.instance.runtime_properties.dirty = True
     ctx.instance.update()
 
 
+@op
+@with_server_client
+def create(server_client,
+           server,
+           networking,
+           allowed_hosts,
+           allowed_clusters,
+           allowed_datastores,
+           os_family,
+           windows_password,
+           windows_organization,
+           windows_timezone,
+           agent_config,
+           custom_sysprep,
+           custom_attributes,
+           use_external_resource,
+           enable_start_vm=False,
+           minimal_vm_version=13,
+           postpone_delete_networks=False,
+           cdrom_image=None,
+           vm_folder=None,
+           extra_config=None,
+           max_wait_time=300,
+           **_):
+    is_node_deprecated(ctx.node.type)
+    if enable_start_vm:
+        ctx.logger.debug('Create operation ignores enable_start_vm property.')
+        enable_start_vm = False
+
+    default_props = False
+    if server:
+        default_props = len(server.keys()) == 1 \
+            and 'add_scale_suffix' in server
+    if (not server or default_props) and not networking:
+        ctx.logger.debug('Create ignored because of empty properties')
+        return
+
+    _create_or_start(server_client=server_client,
+                     server=server,
+                     networking=networking,
+                     allowed_hosts=allowed_hosts,
+                     allowed_clusters=allowed_clusters,
+                     allowed_datastores=allowed_datastores,
+                     os_family=os_family,
+                     windows_password=windows_password,
+                     windows_organization=windows_organization,
+                     windows_timezone=windows_timezone,
+                     agent_config=agent_config,
+                     custom_sysprep=custom_sysprep,
+                     custom_attributes=custom_attributes,
+                     use_external_resource=use_external_resource,
+                     enable_start_vm=enable_start_vm,
+                     minimal_vm_version=minimal_vm_version,
+                     postpone_delete_networks=postpone_delete_networks,
+                     cdrom_image=cdrom_image,
+                     vm_folder=vm_folder,
+                     extra_config=extra_config,
+                     max_wait_time=max_wait_time,
+                     is_start=False)
+
+
 @op
 @with_server_client
 def start(server_client,
@@ -465,71 +564,28 @@ def start(server_client,
           **_):
 
     is_node_deprecated(ctx.node.type)
-    ctx.logger.debug("Checking whether server exists...")
-    if use_external_resource and "name" in server:
-        server_obj = server_client.get_server_by_name(server.get('name'))
-        if not server_obj:
-            raise NonRecoverableError(
-                'A VM with name {0} was not found.'.format(server.get('name')))
-        ctx.instance.runtime_properties[VSPHERE_RESOURCE_EXTERNAL] = True
-    elif 'template' not in server and 'clone_vm' not in server:
-        raise NonRecoverableError('No template/clone_vm provided.')
-    else:
-        server_obj = get_server_by_context(server_client, server, os_family)
-
-    if not server_obj:
-        ctx.logger.info("Server does not exist, creating from scratch.")
-        server_obj = create_new_server(
-            server_client,
-            server,
-            networking,
-            allowed_hosts,
-            allowed_clusters,
-            allowed_datastores,
-            windows_password,
-            windows_organization,
-            windows_timezone,
-            agent_config,
-            custom_sysprep,
-            os_family=os_family,
-            cdrom_image=cdrom_image,
-            vm_folder=vm_folder,
-            extra_config=extra_config,
-            enable_start_vm=enable_start_vm,
-            postpone_delete_networks=postpone_delete_networks,
-            max_wait_time=max_wait_time)
-    else:
-        server_client.update_server(server=server_obj,
-                                    cdrom_image=cdrom_image,
-                                    extra_config=extra_config,
-                                    max_wait_time=max_wait_time)
-        if enable_start_vm:
-            ctx.logger.info("Server already exists, powering on.")
-            server_client.start_server(server=server_obj,
-                                       max_wait_time=max_wait_time)
-            ctx.logger.info("Server powered on.")
-        else:
-            ctx.logger.info("Server already exists, but will not be powered"
-                            "on as enable_start_vm is set to false")
-
-    server_client.add_custom_values(server_obj, custom_attributes or {})
-
-    # update vm version
-    server_client.upgrade_server(server_obj,
-                                 minimal_vm_version=minimal_vm_version,
-                                 max_wait_time=max_wait_time)
-
-    # remove nic's by mac
-    keys_for_remove = ctx.instance.runtime_properties.get('_keys_for_remove')
-    if keys_for_remove:
-        ctx.logger.info("Remove devices: {keys}".format(keys=keys_for_remove))
-        server_client.remove_nic_keys(server_obj, keys_for_remove)
-        del ctx.instance.runtime_properties['_keys_for_remove']
-        ctx.instance.runtime_properties.dirty = True
-        ctx.instance.update()
-    store_server_details(server_client, server_obj)
-    ctx.instance.runtime_properties.dirty = True
-    ctx.instance.update()
+    _create_or_start(server_client=server_client,
+                     server=server,
+                     networking=networking,
+                     allowed_hosts=allowed_hosts,
+                     allowed_clusters=allowed_clusters,
+                     allowed_datastores=allowed_datastores,
+                     os_family=os_family,
+                     windows_password=windows_password,
+                     windows_organization=windows_organization,
+                     windows_timezone=windows_timezone,
+                     agent_config=agent_config,
+                     custom_sysprep=custom_sysprep,
+                     custom_attributes=custom_attributes,
+                     use_external_resource=use_external_resource,
+                     enable_start_vm=enable_start_vm,
+                     minimal_vm_version=minimal_vm_version,
+                     postpone_delete_networks=postpone_delete_networks,
+                     cdrom_image=cdrom_image,
+                     vm_folder=vm_folder,
+                     extra_config=extra_config,
+                     max_wait_time=max_wait_time,
+                     is_start=True)
 
 
 @op
@@ -545,7 +601,7 @@ def shutdown_guest(server_client,
         raise NonRecoverableError(
             "Cannot shutdown server guest - server doesn't exist for node: {0}"
             .format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to shut down server {name}'.format(
         name=vm_name))
     server_client.shutdown_server_guest(server_obj,
@@ -582,7 +638,7 @@ def stop(server_client,
                 "server doesn't exist for node: {0}".format(ctx.instance.id))
         return
 
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Stopping server {name}'.format(name=vm_name))
     server_client.stop_server(server_obj, max_wait_time=max_wait_time)
     ctx.logger.info('Stopped server {name}'.format(name=vm_name))
@@ -603,7 +659,7 @@ def freeze_suspend(server_client,
         raise NonRecoverableError(
             "Cannot suspend server - server doesn't exist for node: {0}"
             .format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to suspend server {name}'.format(name=vm_name))
     server_client.suspend_server(server_obj, max_wait_time=max_wait_time)
     ctx.logger.info('Successfully suspended server {name}'.format(
@@ -625,7 +681,7 @@ def freeze_resume(server_client,
         raise NonRecoverableError(
             "Cannot resume server - server doesn't exist for node: {0}"
             .format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to resume server {name}'.format(name=vm_name))
     server_client.start_server(server_obj, max_wait_time=max_wait_time)
     ctx.logger.info('Successfully resumed server {name}'.format(name=vm_name))
@@ -660,7 +716,7 @@ def snapshot_create(server_client,
         raise NonRecoverableError(
             "Cannot backup server - server doesn't exist for node: {0}"
             .format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to backup {snapshot_name} for server {name}'
                     .format(snapshot_name=snapshot_name, name=vm_name))
     server_client.backup_server(
@@ -701,7 +757,7 @@ def snapshot_apply(server_client,
         raise NonRecoverableError(
             "Cannot restore server - server doesn't exist for node: {0}"
             .format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to restore {snapshot_name} for server {name}'
                     .format(snapshot_name=snapshot_name, name=vm_name))
     server_client.restore_server(server_obj,
@@ -738,7 +794,7 @@ def snapshot_delete(server_client,
         raise NonRecoverableError(
             "Cannot remove backup for server - server doesn't exist for "
             "node: {0}".format(ctx.instance.id))
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to remove backup {snapshot_name} for server '
                     '{name}'.format(snapshot_name=snapshot_name, name=vm_name))
     server_client.remove_backup(
@@ -771,28 +827,63 @@ def delete(server_client,
                 "Cannot delete server - server doesn't exist for node: {0}"
                 .format(ctx.instance.id))
         return
-    vm_name = get_vm_name(server, os_family)
+    vm_name = server_obj.name
     ctx.logger.info('Preparing to delete server {name}'.format(name=vm_name))
     server_client.delete_server(server_obj, max_wait_time=max_wait_time)
     ctx.logger.info('Successfully deleted server {name}'.format(name=vm_name))
 
 
+# Runtime property counting the get_state retries, and the backoff for
+# them in seconds.
+GET_STATE_ATTEMPT = '__get_state_attempt'
+RETRY_DELAY_BASE = 2.0
+RETRY_DELAY_CAP = 60.0
+RETRY_DELAY_JITTER = 0.5
+# Past this many attempts the delay no longer grows, this also keeps
+# 2 ** attempt from overflowing on very long retry runs.
+RETRY_DELAY_MAX_EXPONENT = 10
+
+
+def _next_retry_delay(attempt_key,
+                      base=RETRY_DELAY_BASE,
+                      cap=RETRY_DELAY_CAP,
+                      jitter=RETRY_DELAY_JITTER):
+    """Return the delay for the next retry and count the attempt.
+    The attempt number lives in the runtime properties, so the delay keeps
+    growing across operation retries: base * 2 ** attempt, capped and
+    spread by +/- jitter so that many VMs don't poll in lockstep.
+    The count starts again on the first try of an operation, so attempts
+    left by an earlier run don't carry over.
+    """
+    runtime_properties = ctx.instance.runtime_properties
+    attempt = 0
+    if ctx.operation.retry_number:
+        attempt = runtime_properties.get(attempt_key, 0)
+    runtime_properties[attempt_key] = attempt + 1
+    delay = min(cap, base * 2 ** min(attempt, RETRY_DELAY_MAX_EXPONENT))
+    return delay * (1 + random.uniform(-jitter, jitter))
+
+
+# Remainders of the minimum wait time up to this many seconds are slept
+# through rather than retried.
+MIN_WAIT_TIME_SLEEP_LIMIT = 5
+
+
 # min_wait_time should be in seconds.
 def arrived_at_min_wait_time(minimum_wait_time):
-    if '__min_wait_time_start' not in ctx.instance.runtime_properties:
-        ctx.instance.runtime_properties['__min_wait_time_start'] = time.time()
-
-        ctx.logger.info('It will take {} seconds for IP Addresses to be ready'
-                        .format(minimum_wait_time))
-        count = 0
-        ten_sec_to_sleep = 10
-        while count < minimum_wait_time:
-            ctx.logger.info('Waiting for IP Addresses to be ready ...')
-            time.sleep(ten_sec_to_sleep)
-            count += ten_sec_to_sleep
+    runtime_properties = ctx.instance.runtime_properties
+    if '__min_wait_time_start' not in runtime_properties:
+        runtime_properties['__min_wait_time_start'] = time.time()
+        # save start time before handing the wait over to the retry, rather
+        # than holding the worker while it sleeps
+        ctx.instance.update()
+        raise OperationRetry(
+            'It will take {} seconds for IP Addresses to be ready'.format(
+                minimum_wait_time),
+            retry_after=minimum_wait_time)
     else:
         try:
-            remainder = time.time() - ctx.instance.runtime_properties[
+            remainder = time.time() - runtime_properties[
                 '__min_wait_time_start']
 
             ctx.logger.info('The function arrived_at_min_wait_time'
@@ -800,9 +891,17 @@ def arrived_at_min_wait_time(minimum_wait_time):
                             'remainder: {}, '
                             'minimum_wait_time: {}'
                             .format(remainder, minimum_wait_time))
+            remaining = minimum_wait_time - remainder
+            if remaining > MIN_WAIT_TIME_SLEEP_LIMIT:
+                # Retried too early, hand the rest of the wait back to the
+                # scheduler instead of holding the worker.
+                raise OperationRetry(
+                    'It will take {} seconds for IP Addresses to be '
+                    'ready'.format(remaining),
+                    retry_after=remaining)
             # Interrupted sleep
-            if minimum_wait_time > remainder:
-                time.sleep(minimum_wait_time - remainder)
+            if remaining > 0:
+                time.sleep(remaining)
 
         except TypeError:
             ctx.logger.info('minimum_wait_time: not supported ')
@@ -833,74 +932,80 @@ def get_state(server_client,
     manager_network_ip = None
     vm_name = get_vm_name(server, os_family)
 
-    ctx.logger.info('Getting state for server {name} ({os_family})'
-                    .format(name=vm_name, os_family=os_family))
+    ctx.logger.info('Getting state for server %s (%s)', vm_name, os_family)
 
     nets = ctx.instance.runtime_properties.get(NETWORKS)
 
     if os_family == "other":
-        ctx.logger.info("Skip guest checks for other os: {info}"
-                        .format(info=text_type(server_obj.guest)))
+        ctx.logger.info("Skip guest checks for other os: %s",
+                        server_obj.guest)
         try:
             manager_network_ip = server_obj.summary.guest.ipAddress
             public_ip = default_ip = manager_network_ip
 
         except AttributeError:
             ctx.instance.runtime_properties.pop('__min_wait_time_start', None)
+            ctx.instance.runtime_properties.pop(GET_STATE_ATTEMPT, None)
             return True
 
     if default_ip and manager_network_ip or \
             server_client.is_server_guest_running(server_obj):
         ctx.logger.info("Server is running, getting network details.")
-        ctx.logger.info("Guest info: {info}"
-                        .format(info=text_type(server_obj.guest)))
+        ctx.logger.info("Guest info: %s", server_obj.guest)
 
         networks = networking.get('connect_networks', []) if networking else []
-        management_networks = \
-            [network['name'] for network
-             in networking.get('connect_networks', [])
-             if network.get('management', False)]
-        management_network_name = (management_networks[0]
-                                   if len(management_networks) == 1
-                                   else None)
-        ctx.logger.info("Server management networks: {networks}"
-                        .format(networks=text_type(management_networks)))
+        management_network_name = get_network_name_by_flag(
+            networks, 'management')
+        ctx.logger.info("Server management network: %s",
+                        management_network_name)
+
+        # Stored networks by name, a VM may have several NICs on one network.
+        nets_by_name = {}
+        for net in nets or []:
+            nets_by_name.setdefault(net['name'], []).append(net)
 
         # We must obtain IPs at this stage, as they are not populated until
         # after the VM is fully booted
-        for network in server_obj.guest.net:
+        guest_nets = server_obj.guest.net
+        for network in guest_nets:
             network_name = network.network
+            same_net = network_name == management_network_name
+            check_management = not manager_network_ip or (
+                management_network_name and same_net)
+            stored_nets = nets_by_name.get(network_name, [])
+            if default_ip and not check_management and not stored_nets:
+                # nothing to take from this nic
+                continue
+            nic_ip = get_ip_from_vsphere_nic_ips(network)
             # save ip as default
             if not default_ip:
-                default_ip = get_ip_from_vsphere_nic_ips(network)
+                default_ip = nic_ip
             # check management
-            same_net = network_name == management_network_name
-            if not manager_network_ip or (
-                    management_network_name and same_net):
-                manager_network_ip = get_ip_from_vsphere_nic_ips(network)
+            if check_management:
+                manager_network_ip = nic_ip
                 # This should be debug, but left as info until CFY-4867 makes
                 # logs more visible
-                ctx.logger.info("Server management ip address: {0}"
-                                .format(manager_network_ip))
+                ctx.logger.info("Server management ip address: %s",
+                                manager_network_ip)
                 if manager_network_ip is None:
                     ctx.logger.info(
-                        'Manager network IP not yet present for {server}. '
-                        'Retrying.'.format(server=server_obj.name)
-                    )
+                        'Manager network IP not yet present for %s. '
+                        'Retrying.', server_obj.name)
                     # This should all be handled in the create server logic
                     # and use operation retries, but until that is implemented
                     # this will have to remain.
                     raise OperationRetry(
-                        "Management IP addresses not yet assigned.")
-            for net in nets:
-                if net['name'] == network_name:
-                    net[IP] = get_ip_from_vsphere_nic_ips(network)
+                        "Management IP addresses not yet assigned.",
+                        retry_after=_next_retry_delay(GET_STATE_ATTEMPT))
+            for net in stored_nets:
+                net[IP] = nic_ip
 
         # if we have some management network but no ip in such by some reason
         # go and run one more time
         if management_network_name and not manager_network_ip:
             raise OperationRetry(
-                "Management IP addresses not yet assigned.")
+                "Management IP addresses not yet assigned.",
+                retry_after=_next_retry_delay(GET_STATE_ATTEMPT))
 
         ctx.instance.runtime_properties[NETWORKS] = nets
         ctx.instance.runtime_properties[IP] = manager_network_ip or default_ip
@@ -909,45 +1014,42 @@ def get_state(server_client,
             # wait for any ip before next steps
             if wait_ip:
                 ctx.logger.info("Waiting ip export from guest.")
-                raise OperationRetry("IP address not yet exported.")
-
-        if len(server_obj.guest.net):
-            public_ips = [
-                server_client.get_server_ip(server_obj, network['name'])
-                for network in networks
-                if network.get('external', False)]
-
-            if not public_ips:
+                raise OperationRetry(
+                    "IP address not yet exported.",
+                    retry_after=_next_retry_delay(GET_STATE_ATTEMPT))
+
+        if guest_nets:
+            external_network_name = get_network_name_by_flag(
+                networks, 'external')
+            if external_network_name is None:
                 ctx.logger.info("No Server public IP addresses.")
-            elif None in public_ips:
-                raise OperationRetry("Public IP addresses not yet assigned.")
+                public_ip = None
             else:
-                ctx.logger.info("Server public IP addresses: {ips}.".format(
-                    ips=text_type(public_ips)))
-        elif public_ip:
-            public_ips = [public_ip]
-        else:
-            public_ips = []
+                public_ip = server_client.get_server_ip(
+                    server_obj, external_network_name)
+                if public_ip is None:
+                    raise OperationRetry(
+                        "Public IP addresses not yet assigned.",
+                        retry_after=_next_retry_delay(GET_STATE_ATTEMPT))
+                ctx.logger.info("Server public IP address: %s.", public_ip)
 
         # I am uncertain if the logic here is correct, but as this should be
         # refactored to use the more up to date retry logic it's likely not
         # worth a great deal of attention
-        if len(public_ips):
+        if public_ip:
             ctx.logger.debug(
-                "Public IP address for {name}: {ip}".format(
-                    name=vm_name, ip=public_ips[0]))
-            ctx.instance.runtime_properties[PUBLIC_IP] = public_ips[0]
+                "Public IP address for %s: %s", vm_name, public_ip)
+            ctx.instance.runtime_properties[PUBLIC_IP] = public_ip
         else:
-            ctx.logger.debug('Public IP check not required for {server}'
-                             .format(server=server_obj.name))
+            ctx.logger.debug('Public IP check not required for %s',
+                             server_obj.name)
             # Ensure the property still exists
             ctx.instance.runtime_properties[PUBLIC_IP] = None
 
         message = 'Server {name} has started'
         if manager_network_ip:
             message += ' with management IP {mgmt}'
-        if len(public_ips):
-            public_ip = public_ips[0]
+        if public_ip:
             if manager_network_ip:
                 message += ' and'
             message += ' public IP {public}'
@@ -963,16 +1065,17 @@ def get_state(server_client,
             )
         )
         ctx.instance.runtime_properties.pop('__min_wait_time_start', None)
+        ctx.instance.runtime_properties.pop(GET_STATE_ATTEMPT, None)
         return True
-    ctx.logger.info('Server {server} is not started yet'.format(
-        server=server_obj.name))
+    ctx.logger.info('Server %s is not started yet', server_obj.name)
     # check if enable_start_vm is set to false ,
     # no need for retrying hence return true
     if not ctx.node.properties.get('enable_start_vm', True):
         return True
     # This should all be handled in the create server logic and use operation
     # retries, but until that is implemented this will have to remain.
-    raise OperationRetry("Server not yet started.")
+    raise OperationRetry("Server not yet started.",
+                         retry_after=_next_retry_delay(GET_STATE_ATTEMPT))
 
 
 @op
@@ -994,21 +1097,20 @@ def resize_server(server_client,
             "Cannot resize server - "
             "server doesn't exist for node: {0}".format(ctx.instance.id))
 
-    server_client.resize_server(server_obj,
-                                cpus=cpus,
-                                memory=memory,
-                                max_wait_time=max_wait_time)
+    if not server_client.resize_server(server_obj,
+                                       cpus=cpus,
+                                       memory=memory,
+                                       max_wait_time=max_wait_time):
+        ctx.logger.info(
+            'Server %s already has the requested cpus and memory.',
+            server_obj.name)
 
-    for property in 'cpus', 'memory':
-        value = locals()[property]
+    expected_summary = _get_expected_summary()
+    for property, value, summary_key in (('cpus', cpus, 'numCpu'),
+                                         ('memory', memory, 'memorySizeMB')):
         if value:
             ctx.instance.runtime_properties[property] = value
-            if property == 'memory':
-                ctx.instance.runtime_properties['expected_configuration'][
-                    'summary']['memorySizeMB'] = value
-            elif property == 'cpus':
-                ctx.instance.runtime_properties['expected_configuration'][
-                    'summary']['numCpu'] = value
+            expected_summary[summary_key] = value
 
 
 @op
@@ -1034,39 +1136,86 @@ def resize(server_client, server, os_family, **_):
 
     if any(update.values()):
         ctx.logger.info(
-            "Preparing to resize server {name}, with cpus: {cpus}, and "
-            "memory: {memory}".format(
-                name=vm_name,
-                cpus=update['cpus'] or 'no changes',
-                memory=update['memory'] or 'no changes',
-            )
-        )
-        server_client.resize_server(server_obj, **update)
-        ctx.logger.info('Succeeded resizing server {name}.'.format(
-            name=vm_name))
+            "Preparing to resize server %s, with cpus: %s, and memory: %s",
+            vm_name,
+            update['cpus'] or 'no changes',
+            update['memory'] or 'no changes')
+        if server_client.resize_server(server_obj, **update):
+            ctx.logger.info('Succeeded resizing server %s.', vm_name)
+        else:
+            ctx.logger.info(
+                'Server %s already has the requested cpus and memory.',
+                vm_name)
     else:
         raise NonRecoverableError(
             "Server resize parameters should be specified.")
 
 
+def _get_ethernet_networks(server_obj, networks):
+    """Pair each ethernet card of the VM with the network stored for its
+    MAC address in the networks runtime property, or None.
+    """
+    networks_by_mac = {}
+    for network in networks:
+        networks_by_mac.setdefault(network.get('mac'), network)
+    return [(device, networks_by_mac.get(device.macAddress))
+            for device in server_obj.config.hardware.device
+            if isinstance(device, vim.vm.device.VirtualEthernetCard)]
+
+
+def _get_server_configuration(server_obj):
+    """The VM configuration compared by check_drift."""
+    return vmomi_to_dict({
+        'network': server_obj.network,
+        'summary': server_obj.summary.config,
+    })
+
+
+def _get_expected_summary():
+    """The summary part of the expected configuration, created if poststart
+    has not stored one yet.
+    """
+    return ctx.instance.runtime_properties.setdefault(
+        'expected_configuration', {}).setdefault('summary', {})
+
+
+def _store_expected_configuration(server_obj):
+    runtime_properties = ctx.instance.runtime_properties
+    runtime_properties['expected_configuration'] = \
+        _get_server_configuration(server_obj)
+    runtime_properties[EXPECTED_CONFIGURATION_VERSION] = \
+        server_obj.config.changeVersion
+
+
+def _get_current_configuration(server_obj):
+    """The VM configuration to check for drift.
+    vSphere updates config.changeVersion on every change of the VM
+    configuration, so while it still matches the version the expected
+    configuration was taken at, the expected summary is reused rather than
+    converted again. The networks are always converted, as port groups can
+    be renamed or moved without changing the VM's changeVersion.
+    """
+    runtime_properties = ctx.instance.runtime_properties
+    expected_configuration = \
+        runtime_properties.get('expected_configuration') or {}
+    change_version = server_obj.config.changeVersion
+    if change_version and 'summary' in expected_configuration and \
+            change_version == runtime_properties.get(
+                EXPECTED_CONFIGURATION_VERSION):
+        return {
+            'network': vmomi_to_dict(server_obj.network),
+            'summary': expected_configuration['summary'],
+        }
+    return _get_server_configuration(server_obj)
+
+
 @op
 @with_server_client
 def poststart(server_client, server, os_family, **_):
     server_obj = get_server_by_context(server_client, server, os_family)
-    ctx.logger.debug("Summary config: {}".format(server_obj.summary.config))
-    ctx.logger.debug("Network vm: {}".format(server_obj.network))
-    expected_configuration = {}
-    network = json.loads(json.dumps(server_obj.network,
-                                    cls=VmomiSupport.VmomiJSONEncoder,
-                                    sort_keys=True, indent=4))
-    summary = json.loads(json.dumps(server_obj.summary.config,
-                                    cls=VmomiSupport.VmomiJSONEncoder,
-                                    sort_keys=True, indent=4))
-    expected_configuration['network'] = network
-    expected_configuration['summary'] = summary
-
-    ctx.instance.runtime_properties[
-        'expected_configuration'] = expected_configuration
+    ctx.logger.debug("Summary config: %s", server_obj.summary.config)
+    ctx.logger.debug("Network vm: %s", server_obj.network)
+    _store_expected_configuration(server_obj)
     ctx.instance.update()
 
 
@@ -1079,38 +1228,22 @@ def check_drift(server_client, **_):
         raise NonRecoverableError('Instance not configured correctly')
 
     server_obj = server_client.get_server_by_id(server_id)
-    ctx.logger.info(
-        'Checking drift state for {resource_name}.'.format(
-            resource_name=server_obj.name))
+    ctx.logger.info('Checking drift state for %s.', server_obj.name)
     ctx.instance.refresh()
 
     expected_configuration = ctx.instance.runtime_properties.get(
         'expected_configuration')
-    current_configuration = {}
-    network = json.loads(json.dumps(server_obj.network,
-                                    cls=VmomiSupport.VmomiJSONEncoder,
-                                    sort_keys=True, indent=4))
-    summary = json.loads(json.dumps(server_obj.summary.config,
-                                    cls=VmomiSupport.VmomiJSONEncoder,
-                                    sort_keys=True, indent=4))
-    current_configuration['network'] = network
-    current_configuration['summary'] = summary
+    current_configuration = _get_current_configuration(server_obj)
 
     needs_update = False
 
     networks = ctx.instance.runtime_properties.get('networks', [])
-    existing_networks = []
-    for device in server_obj.config.hardware.device:
-        if isinstance(device, vim.vm.device.VirtualEthernetCard):
-            defined = False
-            for network in networks:
-                if device.macAddress == network.get('mac'):
-                    defined = True
-                    existing_networks.append(network.get('name'))
-                    break
-            if not defined:
-                # not in defined networks...let's cause diff
-                existing_networks.append(uuid.uuid4())
+    existing_networks = [
+        network.get('name') if network is not None
+        # not in defined networks...let's cause diff
+        else UNMATCHED_NETWORK
+        for _, network in _get_ethernet_networks(server_obj, networks)
+    ]
     # get new networks
     new_networks = [
         network.get('name') for network in ctx.node.properties.get(
@@ -1142,9 +1275,87 @@ def check_drift(server_client, **_):
                              current_configuration)
 
 
+# Runtime properties tracking the wait for guest networks in update, and
+# the longest that wait may take in seconds.
+UPDATE_NET_ATTEMPT = '__update_net_attempt'
+UPDATE_NET_DEADLINE = '__update_net_deadline'
+UPDATE_NET_MAX_WAIT = 360
+
+
+def _wait_for_guest_net(server_client, server_obj=None):
+    """Return the VM once its guest reports networks.
+    Until then the wait is handed over to an operation retry, backing off
+    from 1 up to 30 seconds, and given up after UPDATE_NET_MAX_WAIT.
+    """
+    runtime_properties = ctx.instance.runtime_properties
+    if server_obj is None:
+        # Only this VM is collected on each retry, not the whole inventory.
+        server_obj = server_client._refresh_vm_by_id(
+            runtime_properties[VSPHERE_SERVER_ID])
+    if server_obj.guest.net:
+        runtime_properties.pop(UPDATE_NET_ATTEMPT, None)
+        runtime_properties.pop(UPDATE_NET_DEADLINE, None)
+        return server_obj
+
+    deadline = runtime_properties.setdefault(
+        UPDATE_NET_DEADLINE, time.time() + UPDATE_NET_MAX_WAIT)
+    if time.time() > deadline:
+        runtime_properties.pop(UPDATE_NET_ATTEMPT, None)
+        runtime_properties.pop(UPDATE_NET_DEADLINE, None)
+        ctx.instance.update()
+        raise NonRecoverableError(
+            'Server {name} reported no guest networks within {wait} '
+            'seconds.'.format(name=server_obj.name, wait=UPDATE_NET_MAX_WAIT))
+    retry_after = _next_retry_delay(UPDATE_NET_ATTEMPT, base=1.0, cap=30.0)
+    # save the deadline, the attempt count and the already applied update
+    # before handing the wait over to the retry
+    ctx.instance.update()
+    raise OperationRetry(
+        'Waiting for guest networks of server {name}.'.format(
+            name=server_obj.name),
+        retry_after=retry_after)
+
+
+def _resuming_guest_net_wait():
+    """Tell whether this update is a retry of the wait for guest networks.
+    A wait left behind by a cancelled or failed run is dropped on the first
+    try of the operation, so it can't skip or fail a new update.
+    """
+    runtime_properties = ctx.instance.runtime_properties
+    if ctx.operation.retry_number and \
+            UPDATE_NET_DEADLINE in runtime_properties:
+        return True
+    runtime_properties.pop(UPDATE_NET_ATTEMPT, None)
+    runtime_properties.pop(UPDATE_NET_DEADLINE, None)
+    return False
+
+
+def _store_guest_ip(server_obj, networking):
+    default_ip = None
+    manager_network_ip = None
+    management_network_name = get_network_name_by_flag(
+        networking.get('connect_networks', []), 'management')
+    for network in server_obj.guest.net:
+        network_name = network.network
+        if not default_ip:
+            default_ip = get_ip_from_vsphere_nic_ips(network)
+        same_net = network_name == management_network_name
+        if not manager_network_ip or (
+                management_network_name and same_net):
+            manager_network_ip = get_ip_from_vsphere_nic_ips(network)
+    ctx.instance.runtime_properties[IP] = manager_network_ip or default_ip
+
+
 @op
 @with_server_client
 def update(server_client, **_):
+    if _resuming_guest_net_wait():
+        # The devices were already updated, this is a retry of the wait
+        # for the guest to report its networks.
+        server_obj = _wait_for_guest_net(server_client)
+        _store_guest_ip(server_obj, ctx.node.properties.get('networking', {}))
+        ctx.instance.update()
+        return
     spec_update = ctx.instance.runtime_properties.pop('spec_update', None)
     network_update = \
         ctx.instance.runtime_properties.pop('network_update', None)
@@ -1159,55 +1370,37 @@ def update(server_client, **_):
                                     max_wait_time=300)
         ctx.instance.runtime_properties['cpus'] = cpus
         ctx.instance.runtime_properties['memory'] = memory
-        ctx.instance.runtime_properties['expected_configuration'][
-            'summary']['memorySizeMB'] = memory
-        ctx.instance.runtime_properties['expected_configuration'][
-            'summary']['numCpu'] = cpus
+        expected_summary = _get_expected_summary()
+        expected_summary['memorySizeMB'] = memory
+        expected_summary['numCpu'] = cpus
     if network_update:
         server_obj = server_client.get_server_by_id(
             ctx.instance.runtime_properties[VSPHERE_SERVER_ID])
 
         # check existing networks [against runtime-props and reality]
         networks = ctx.instance.runtime_properties.get('networks', [])
-        real_networks = []
-        for device in server_obj.config.hardware.device:
-            if isinstance(device, vim.vm.device.VirtualEthernetCard):
-                for network in networks:
-                    if device.macAddress == network.get('mac'):
-                        real_networks.append(network.get('name'))
-                        break
+        ethernet_networks = _get_ethernet_networks(server_obj, networks)
+        real_networks = set(network.get('name')
+                            for _, network in ethernet_networks
+                            if network is not None)
         # doctor new networks provided from update
         networking = ctx.node.properties.get('networking', {})
         new_networks = handle_networks(networking)
-        new_network_names = [network.get('name') for network in new_networks]
+        new_network_names = set(network.get('name')
+                                for network in new_networks)
 
         # get networks to remove/add
-        to_add = []
-        to_remove = []
-        for network in real_networks:
-            if network not in new_network_names:
-                to_remove.append(network)
-        for network in new_network_names:
-            if network not in real_networks:
-                to_add.append(network)
+        to_add = new_network_names - real_networks
+        to_remove = real_networks - new_network_names
 
         # go through the nics to remove what is not intended
         nics_for_remove = []
         device_changes = []
-        netcnt = 0
-        for device in server_obj.config.hardware.device:
-            if isinstance(device, vim.vm.device.VirtualEthernetCard):
-                netcnt += 1
-                defined = False
-                for network in networks:
-                    if device.macAddress == network.get('mac'):
-                        defined = True
-                        if network.get('name') in to_remove:
-                            nics_for_remove.append(device)
-                        break
-                if not defined:
-                    # not in defined networks...
-                    nics_for_remove.append(device)
+        netcnt = len(ethernet_networks)
+        for device, network in ethernet_networks:
+            # not in defined networks...
+            if network is None or network.get('name') in to_remove:
+                nics_for_remove.append(device)
         if nics_for_remove:
             netcnt -= len(nics_for_remove)
             for nic in nics_for_remove:
@@ -1217,16 +1410,21 @@ def update(server_client, **_):
                     vim.vm.device.VirtualDeviceSpec.Operation.remove
                 device_changes.append(nicspec)
 
-        datacenter_name = server_client.cfg['datacenter_name']
-        datacenter = server_client._get_obj_by_name(vim.Datacenter,
-                                                    datacenter_name)
-        # go through the new networks to add them
-        for network in new_networks:
-            if network.get('name') in to_add:
+        if to_add:
+            datacenter_name = server_client.cfg['datacenter_name']
+            datacenter = server_client._get_obj_by_name(vim.Datacenter,
+                                                        datacenter_name)
+            # go through the new networks to add them
+            networks_to_add = [network for network in new_networks
+                               if network.get('name') in to_add]
+            for network in networks_to_add:
                 network['name'] = \
                     server_client._get_connected_network_name(network)
-                nicspec, _ = \
-                    server_client._add_network(network, datacenter, netcnt)
+            network_objs = server_client._get_network_objs(networks_to_add,
+                                                           datacenter)
+            for network, network_obj in zip(networks_to_add, network_objs):
+                nicspec, _ = server_client._add_network_spec(
+                    network, network_obj, netcnt)
                 device_changes.append(nicspec)
                 netcnt += 1
 
@@ -1237,54 +1435,14 @@ def update(server_client, **_):
             server_client._wait_for_task(task)
 
         # get server object again to update networks
-        server_obj = \
-            server_client._get_obj_by_id(
-                vim.VirtualMachine,
-                ctx.instance.runtime_properties[VSPHERE_SERVER_ID],
-                use_cache=False)
+        server_obj = server_client._refresh_vm(server_obj)
         store_server_details(server_client, server_obj)
 
         # update expected configuration after update
-        expected_configuration = {}
-        network = json.loads(json.dumps(server_obj.network,
-                                        cls=VmomiSupport.VmomiJSONEncoder,
-                                        sort_keys=True, indent=4))
-        summary = json.loads(json.dumps(server_obj.summary.config,
-                                        cls=VmomiSupport.VmomiJSONEncoder,
-                                        sort_keys=True, indent=4))
-        expected_configuration['network'] = network
-        expected_configuration['summary'] = summary
-
-        ctx.instance.runtime_properties[
-            'expected_configuration'] = expected_configuration
+        _store_expected_configuration(server_obj)
 
         if new_networks:
-            # fetch new IP
-            default_ip = None
-            manager_network_ip = None
-            management_networks = \
-                [network['name'] for network
-                 in networking.get('connect_networks', [])
-                 if network.get('management', False)]
-            management_network_name = (management_networks[0]
-                                       if len(management_networks) == 1
-                                       else None)
             # make sure that networks have IPs
-            while not server_obj.guest.net:
-                server_obj = \
-                    server_client._get_obj_by_id(
-                        vim.VirtualMachine,
-                        ctx.instance.runtime_properties[VSPHERE_SERVER_ID],
-                        use_cache=False)
-                time.sleep(10)
-            for network in server_obj.guest.net:
-                network_name = network.network
-                if not default_ip:
-                    default_ip = get_ip_from_vsphere_nic_ips(network)
-                same_net = network_name == management_network_name
-                if not manager_network_ip or (
-                        management_network_name and same_net):
-                    manager_network_ip = get_ip_from_vsphere_nic_ips(network)
-            ctx.instance.runtime_properties[IP] = manager_network_ip or \
-                default_ip
+            server_obj = _wait_for_guest_net(server_client, server_obj)
+            _store_guest_ip(server_obj, networking)
         ctx.instance.update()
@@ -20,6 +20,7 @@ from cloudify.state import current_ctx
 from cloudify.mocks import MockCloudifyContext
 from cloudify.exceptions import NonRecoverableError, OperationRetry
 
+from vsphere_plugin_common import clients
 from vsphere_plugin_common.constants import DELETE_NODE_ACTION
 import vsphere_server_plugin.server as server
 
@@ -28,6 +29,7 @@ class BackupServerTest(unittest.TestCase):
 
     def tearDown(self):
         current_ctx.clear()
+        clients.reset_sessions()
         super(BackupServerTest, self).tearDown()
 
     def _gen_ctx(self):
@@ -15,11 +15,30 @@
 import json
 import unittest
 
+from mock import Mock
+
+from cloudify.state import current_ctx
+from cloudify.mocks import MockCloudifyContext
+from cloudify.exceptions import NonRecoverableError, OperationRetry
+
 import vsphere_server_plugin.server as server
 
 
 class ServerTest(unittest.TestCase):
 
+    def tearDown(self):
+        current_ctx.clear()
+        super(ServerTest, self).tearDown()
+
+    def _gen_ctx(self):
+        _ctx = MockCloudifyContext(
+            'node_name',
+            properties={},
+            runtime_properties={}
+        )
+        current_ctx.set(_ctx)
+        return _ctx
+
     def test_validate_connect_network(self):
         examples = json.loads(json.dumps([
             ({
@@ -63,6 +82,270 @@ class ServerTest(unittest.TestCase):
                 server.validate_connect_network(from_net), to_net
             )
 
+    def test_validate_connect_network_errors(self):
+        with self.assertRaisesRegexp(
+            NonRecoverableError,
+            'Network has unsupported key: bogus'
+        ):
+            server.validate_connect_network({'name': 'net', 'bogus': 1})
+        with self.assertRaisesRegexp(
+            NonRecoverableError,
+            'Network Key external has unsupported type'
+        ):
+            server.validate_connect_network({'name': 'net', 'external': 'y'})
+        with self.assertRaisesRegexp(
+            NonRecoverableError,
+            'All networks connected to a server must have a name specified.'
+        ):
+            server.validate_connect_network({'external': True})
+        with self.assertRaises(NonRecoverableError) as error:
+            server.validate_connect_network({'name': 'net', 'bogus': 1})
+        self.assertEqual(
+            'Network failed validation: '
+            'Network has unsupported key: bogus. Value: 1',
+            str(error.exception))
+        with self.assertRaises(NonRecoverableError) as error:
+            server.validate_connect_network({'bogus': 1})
+        self.assertEqual(
+            'Network failed validation: '
+            'All networks connected to a server must have a name specified.; '
+            'Network has unsupported key: bogus. Value: 1',
+            str(error.exception))
+
+    def test_handle_networks(self):
+        self._gen_ctx()
+        self.assertEqual([], server.handle_networks({}))
+        networks = server.handle_networks({
+            'connect_networks': [
+                {'name': 'Internal', 'management': True},
+                {'name': 'External', 'external': True},
+            ]
+        })
+        self.assertEqual(['External', 'Internal'],
+                         [network['name'] for network in networks])
+        self.assertTrue(networks[0]['external'])
+        self.assertTrue(networks[1]['management'])
+
+    def test_handle_networks_too_many(self):
+        self._gen_ctx()
+        for flag in ('external', 'management'):
+            with self.assertRaisesRegexp(
+                NonRecoverableError,
+                'No more than one {0} network can be specified.'.format(flag)
+            ):
+                server.handle_networks({
+                    'connect_networks': [
+                        {'name': 'first', flag: True},
+                        {'name': 'second', flag: True},
+                    ]
+                })
+
+    def test_get_network_name_by_flag(self):
+        networks = [{'name': 'Internal', 'management': True},
+                    {'name': 'External', 'external': True}]
+        self.assertEqual('Internal',
+                         server.get_network_name_by_flag(networks,
+                                                         'management'))
+        self.assertEqual('External',
+                         server.get_network_name_by_flag(networks,
+                                                         'external'))
+        self.assertIsNone(server.get_network_name_by_flag([], 'external'))
+
+    def test_get_vm_name(self):
+        _ctx = self._gen_ctx()
+        _ctx.instance._id = 'node_name_abc123'
+        self.assertEqual(
+            'node-name-abc123', server.get_vm_name({}, 'linux'))
+        self.assertEqual(
+            'node-name-abc123', _ctx.instance.runtime_properties['name'])
+        # the stored name is reused as is
+        self.assertEqual(
+            'node-name-abc123',
+            server.get_vm_name({'name': 'other'}, 'linux'))
+
+    def test_arrived_at_min_wait_time(self):
+        _ctx = self._gen_ctx()
+        with self.assertRaisesRegexp(
+            OperationRetry,
+            'It will take 30 seconds for IP Addresses to be ready'
+        ) as retry:
+            server.arrived_at_min_wait_time(30)
+        self.assertEqual(30, retry.exception.retry_after)
+        self.assertIn('__min_wait_time_start',
+                      _ctx.instance.runtime_properties)
+
+        # an early retry waits out the rest through another retry
+        _ctx.instance.runtime_properties['__min_wait_time_start'] -= 10
+        with self.assertRaises(OperationRetry) as retry:
+            server.arrived_at_min_wait_time(30)
+        self.assertTrue(19 < retry.exception.retry_after <= 20)
+
+        # the retry after the wait goes on
+        _ctx.instance.runtime_properties['__min_wait_time_start'] -= 20
+        server.arrived_at_min_wait_time(30)
+
+    def test_next_retry_delay(self):
+        _ctx = self._gen_ctx()
+        _ctx._operation = Mock(retry_number=1)
+        delays = [server._next_retry_delay('__attempt', jitter=0)
+                  for _ in range(7)]
+        self.assertEqual([2, 4, 8, 16, 32, 60, 60], delays)
+        self.assertEqual(7, _ctx.instance.runtime_properties['__attempt'])
+
+        _ctx.instance.runtime_properties['__attempt'] = 1
+        delay = server._next_retry_delay('__attempt')
+        self.assertTrue(2 <= delay <= 6)
+
+        # very long retry runs don't overflow
+        _ctx.instance.runtime_properties['__attempt'] = 1100
+        self.assertEqual(
+            60, server._next_retry_delay('__attempt', jitter=0))
+
+        # the first try of an operation starts counting again
+        _ctx._operation.retry_number = 0
+        self.assertEqual(2, server._next_retry_delay('__attempt', jitter=0))
+        self.assertEqual(1, _ctx.instance.runtime_properties['__attempt'])
+
+    def test_wait_for_guest_net(self):
+        _ctx = self._gen_ctx()
+        runtime_properties = _ctx.instance.runtime_properties
+        runtime_properties[server.VSPHERE_SERVER_ID] = 'vm-1'
+        server_obj = Mock()
+        server_obj.name = 'vm'
+        server_obj.guest.net = []
+        server_client = Mock()
+        server_client._refresh_vm_by_id.return_value = server_obj
+        _ctx.instance.update = Mock()
+
+        with self.assertRaisesRegexp(
+            OperationRetry,
+            'Waiting for guest networks of server vm.'
+        ):
+            server._wait_for_guest_net(server_client, server_obj)
+        self.assertIn(server.UPDATE_NET_DEADLINE, runtime_properties)
+        _ctx.instance.update.assert_called_once_with()
+
+        server_obj.guest.net = [Mock()]
+        self.assertEqual(
+            server_obj, server._wait_for_guest_net(server_client))
+        server_client._refresh_vm_by_id.assert_called_once_with('vm-1')
+        self.assertNotIn(server.UPDATE_NET_DEADLINE, runtime_properties)
+        self.assertNotIn(server.UPDATE_NET_ATTEMPT, runtime_properties)
+
+        server_obj.guest.net = []
+        runtime_properties[server.UPDATE_NET_DEADLINE] = 0
+        with self.assertRaisesRegexp(
+            NonRecoverableError,
+            'Server vm reported no guest networks within 360 seconds.'
+        ):
+            server._wait_for_guest_net(server_client, server_obj)
+
+    def test_resuming_guest_net_wait(self):
+        _ctx = self._gen_ctx()
+        _ctx._operation = Mock(retry_number=0)
+        runtime_properties = _ctx.instance.runtime_properties
+        self.assertFalse(server._resuming_guest_net_wait())
+
+        runtime_properties[server.UPDATE_NET_DEADLINE] = 0
+        runtime_properties[server.UPDATE_NET_ATTEMPT] = 3
+        _ctx._operation.retry_number = 1
+        self.assertTrue(server._resuming_guest_net_wait())
+
+        # a wait left by an earlier run is dropped on a first try
+        _ctx._operation.retry_number = 0
+        self.assertFalse(server._resuming_guest_net_wait())
+        self.assertNotIn(server.UPDATE_NET_DEADLINE, runtime_properties)
+        self.assertNotIn(server.UPDATE_NET_ATTEMPT, runtime_properties)
+
+    def test_get_ethernet_networks(self):
+        known = server.vim.vm.device.VirtualVmxnet3(macAddress='00:01')
+        unknown = server.vim.vm.device.VirtualE1000(macAddress='00:02')
+        disk = server.vim.vm.device.VirtualDisk()
+        server_obj = Mock()
+        server_obj.config.hardware.device = [known, disk, unknown]
+        networks = [{'name': 'first', 'mac': '00:01'},
+                    {'name': 'second', 'mac': '00:01'}]
+
+        self.assertEqual(
+            [(known, networks[0]), (unknown, None)],
+            server._get_ethernet_networks(server_obj, networks))
+
+    def test_get_current_configuration(self):
+        _ctx = self._gen_ctx()
+        server_obj = Mock()
+        server_obj.network = []
+        server_obj.summary.config = server.vim.vm.Summary.ConfigSummary(
+            name='vm', numCpu=1)
+        server_obj.config.changeVersion = 'version-1'
+        server._store_expected_configuration(server_obj)
+        expected = _ctx.instance.runtime_properties['expected_configuration']
+        self.assertEqual('vm', expected['summary']['name'])
+        self.assertEqual(
+            'version-1',
+            _ctx.instance.runtime_properties[
+                server.EXPECTED_CONFIGURATION_VERSION])
+
+        # an unchanged summary is not converted again, networks always are
+        server_obj.network = [{'name': 'renamed'}]
+        current = server._get_current_configuration(server_obj)
+        self.assertIs(expected['summary'], current['summary'])
+        self.assertEqual([{'name': 'renamed'}], current['network'])
+
+        server_obj.summary.config.numCpu = 2
+        server_obj.config.changeVersion = 'version-2'
+        current = server._get_current_configuration(server_obj)
+        self.assertEqual(2, current['summary']['numCpu'])
+
+    def test_get_expected_summary(self):
+        _ctx = self._gen_ctx()
+        server._get_expected_summary()['numCpu'] = 2
+        self.assertEqual(
+            {'summary': {'numCpu': 2}},
+            _ctx.instance.runtime_properties['expected_configuration'])
+        server._get_expected_summary()['memorySizeMB'] = 1024
+        self.assertEqual(
+            {'summary': {'numCpu': 2, 'memorySizeMB': 1024}},
+            _ctx.instance.runtime_properties['expected_configuration'])
+
+    def test_validate_vm_name(self):
+        server.validate_vm_name('server-1')
+        with self.assertRaisesRegexp(
+            NonRecoverableError,
+            'Computer name must contain only A-Z, a-z, 0-9'
+        ):
+            server.validate_vm_name('server_1')
+
+    def test_as_list(self):
+        self.assertEqual(['host'], server._as_list('host'))
+        self.assertEqual(['a', 'b'], server._as_list(['a', 'b']))
+        self.assertIsNone(server._as_list(None))
+
+    def test_get_connected_networks(self):
+        _ctx = self._gen_ctx()
+        rels = []
+        for name in ('merged', 'related'):
+            rel = Mock()
+            rel.type_hierarchy = [server.RELATIONSHIP_VM_TO_NIC]
+            rel.target.instance.id = '{0}_nic'.format(name)
+            rel.target.instance.runtime_properties = {
+                'connected_network': {'name': name, 'use_dhcp': False}}
+            rels.append(rel)
+        _ctx.instance._relationships = rels
+
+        networks = server.get_connected_networks([
+            {'name': 'plain'},
+            {'name': 'merged', 'from_relationship': True},
+        ])
+        self.assertEqual([
+            {'name': 'plain'},
+            {'name': 'merged', 'from_relationship': True, 'use_dhcp': False},
+            {'name': 'related', 'use_dhcp': False},
+        ], networks)
+        self.assertEqual(
+            ['merged_nic', 'related_nic'],
+            _ctx.instance.runtime_properties[
+                server.VSPHERE_SERVER_CONNECTED_NICS])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -67,8 +67,13 @@ def create(storage_client,
             'Error during trying to create storage: storage should be '
             'related to a VM, but capabilities are empty.')
 
-    connected_vms = [rt_properties for rt_properties in capabilities
-                     if VSPHERE_SERVER_ID in rt_properties]
+    connected_vms = []
+    for rt_properties in capabilities:
+        if VSPHERE_SERVER_ID in rt_properties:
+            connected_vms.append(rt_properties)
+            # One extra VM is enough to know the relationship is invalid.
+            if len(connected_vms) > 1:
+                break
     if len(connected_vms) != 1:
         raise NonRecoverableError(
             'Error during trying to create storage: storage may be '